@@ -0,0 +1,218 @@
+"""
+Graph-wide analytics for the degrees dataset with sparse matrices.
+
+The person x movie incidence matrix A is built straight from the CSR
+arrays of a CompactGraph, without copying. Everything else is sparse
+products over it: A @ A.T gives co-star counts, one row block at a time
+to bound memory, and breadth-first search keeps each frontier as a
+boolean vector, so a whole layer is expanded by two matrix-vector
+products (people -> movies -> people) instead of a Python loop per edge.
+
+Requires NumPy and SciPy; writing Parquet also requires pyarrow.
+
+Usage: python analytics.py [directory] [--output analytics] [--format csv]
+                           [--hub ID] [--sample N] [--hops K]
+"""
+
+import argparse
+import csv
+import os
+
+from graph import CompactGraph
+from snapshot import load_snapshot
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMATS = ("csv", "parquet")
+
+
+def incidence_matrix(graph):
+    """
+    Returns the people x movies incidence matrix of `graph` as a SciPy
+    CSR matrix sharing the graph's adjacency arrays.
+    """
+    _require_scipy()
+    indptr = np.frombuffer(graph.person_offsets, dtype=np.int64)
+    indices = np.frombuffer(graph.person_movies, dtype=np.int32)
+    data = np.ones(len(indices), dtype=np.int32)
+    return sparse.csr_matrix(
+        (data, indices, indptr), shape=(graph.num_people, graph.num_movies), copy=False
+    )
+
+
+def person_metrics(incidence, block=4096):
+    """
+    Returns per-person arrays of movies, co-star appearances (co-stars
+    counted once per shared movie) and distinct co-stars. Distinct
+    co-stars are the non-zeros of A @ A.T, found `block` rows at a time.
+    """
+    _require_scipy()
+    movies = np.diff(incidence.indptr)
+    cast_sizes = np.asarray(incidence.sum(axis=0)).ravel()
+    appearances = incidence @ (cast_sizes - 1)
+
+    transpose = incidence.T.tocsr()
+    distinct = np.empty(incidence.shape[0], dtype=np.int64)
+    for start in range(0, incidence.shape[0], block):
+        product = incidence[start:start + block] @ transpose
+        distinct[start:start + block] = np.diff(product.indptr)
+
+    # Everyone in a movie co-occurs with themselves
+    distinct -= movies > 0
+    return {
+        "movies": movies,
+        "costar_appearances": appearances,
+        "distinct_costars": distinct,
+    }
+
+
+def separation_counts(incidence, source):
+    """
+    Returns an array whose entry d is the number of people d degrees of
+    separation from dense person `source`, by bitvector BFS.
+    """
+    _require_scipy()
+    transpose = incidence.T.tocsr()
+    visited = np.zeros(incidence.shape[0], dtype=bool)
+    visited_movies = np.zeros(incidence.shape[1], dtype=bool)
+    visited[source] = True
+    frontier = visited.copy()
+
+    counts = [1]
+    while True:
+        movies = (transpose @ frontier.astype(np.int32)) > 0
+        movies &= ~visited_movies
+        visited_movies |= movies
+        frontier = (incidence @ movies.astype(np.int32)) > 0
+        frontier &= ~visited
+        if not frontier.any():
+            return np.array(counts, dtype=np.int64)
+        visited |= frontier
+        counts.append(int(frontier.sum()))
+
+
+def neighborhood_sizes(incidence, sources, hops, batch=16):
+    """
+    Returns a len(sources) x hops array whose entry [i, k] is the number
+    of people within k + 1 degrees of sources[i], excluding itself.
+    Sources are searched `batch` at a time as the columns of one
+    boolean frontier matrix.
+    """
+    _require_scipy()
+    transpose = incidence.T.tocsr()
+    sizes = np.zeros((len(sources), hops), dtype=np.int64)
+    for start in range(0, len(sources), batch):
+        columns = np.asarray(sources[start:start + batch])
+        visited = np.zeros((incidence.shape[0], len(columns)), dtype=bool)
+        visited[columns, np.arange(len(columns))] = True
+        frontier = visited
+        for hop in range(hops):
+            movies = (transpose @ frontier.astype(np.int32)) > 0
+            frontier = (incidence @ movies.astype(np.int32)) > 0
+            frontier &= ~visited
+            visited = visited | frontier
+            sizes[start:start + len(columns), hop] = visited.sum(axis=0) - 1
+    return sizes
+
+
+def write_table(path, columns):
+    """
+    Write a dict of equal-length columns to `path`, as Parquet if it
+    ends in .parquet and as CSV otherwise.
+    """
+    if path.endswith(".parquet"):
+        if pyarrow is None:
+            raise ImportError("writing Parquet requires pyarrow")
+        pyarrow.parquet.write_table(pyarrow.table(columns), path)
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(zip(*(_values(column) for column in columns.values())))
+
+
+def _values(column):
+    return column.tolist() if hasattr(column, "tolist") else column
+
+
+def _require_scipy():
+    if sparse is None:
+        raise ImportError("degrees analytics require NumPy and SciPy")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--output", default="analytics", help="directory for the results")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--hub", help="person id to measure separation from "
+                        "(default: the person with the most co-star appearances)")
+    parser.add_argument("--sample", type=int, default=1000,
+                        help="number of people to measure neighborhoods of")
+    parser.add_argument("--hops", type=int, default=3, help="largest neighborhood radius")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--snapshot", action="store_true")
+    args = parser.parse_args()
+    if sparse is None:
+        parser.error("analytics require NumPy and SciPy")
+    if args.format == "parquet" and pyarrow is None:
+        parser.error("--format parquet requires pyarrow")
+
+    print("Loading data...")
+    if args.snapshot:
+        graph = load_snapshot(args.directory)
+    else:
+        graph = CompactGraph.from_csv(args.directory)
+    incidence = incidence_matrix(graph)
+    person_ids = np.frombuffer(graph.person_ids, dtype=np.int64)
+    os.makedirs(args.output, exist_ok=True)
+    sparse.save_npz(os.path.join(args.output, "incidence.npz"), incidence)
+
+    print("Computing co-star counts...")
+    metrics = person_metrics(incidence)
+    write_table(
+        os.path.join(args.output, f"people.{args.format}"),
+        {"person_id": person_ids, **metrics},
+    )
+
+    if args.hub is None:
+        hub = int(np.argmax(metrics["costar_appearances"]))
+    else:
+        hub = graph.person_index(args.hub)
+        if hub is None:
+            parser.error(f"unknown person: {args.hub}")
+    print(f"Computing separation from {graph.person_names[hub]}...")
+    counts = separation_counts(incidence, hub)
+    write_table(
+        os.path.join(args.output, f"separation.{args.format}"),
+        {"degrees": np.arange(len(counts)), "people": counts},
+    )
+
+    print(f"Computing {args.hops}-hop neighborhoods of {args.sample} people...")
+    rng = np.random.default_rng(args.seed)
+    sample = np.sort(rng.choice(
+        graph.num_people, size=min(args.sample, graph.num_people), replace=False
+    ))
+    sizes = neighborhood_sizes(incidence, sample, args.hops)
+    write_table(
+        os.path.join(args.output, f"neighborhoods.{args.format}"),
+        {
+            "person_id": person_ids[sample],
+            **{f"within_{hop + 1}": sizes[:, hop] for hop in range(args.hops)},
+        },
+    )
+    print(f"Results written to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Export everyone's degrees of separation from one person.
+
+Runs a single breadth-first search from the source and writes one CSV
+row per connected person as they are reached: their id, degrees of
+separation, and the movie and co-star one degree closer to the source.
+Following predecessors back reconstructs any shortest path. People not
+connected to the source are left out.
+
+Usage: python bacon.py [directory] --source ID_OR_NAME [--output bacon.csv]
+"""
+
+import argparse
+import csv
+import sys
+
+import degrees
+
+COLUMNS = ("person_id", "degrees", "movie_id", "predecessor_id")
+
+
+def export(source, f):
+    """
+    Write the separation of every person connected to `source` to the
+    file `f` as CSV. Returns the number of people at each degree.
+    """
+    writer = csv.writer(f)
+    writer.writerow(COLUMNS)
+    counts = []
+    for row in degrees.separations(source):
+        writer.writerow(row)
+        if row[1] == len(counts):
+            counts.append(0)
+        counts[row[1]] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--source", required=True, help="person id or name")
+    parser.add_argument("--output", help="CSV file to write (default: stdout)")
+    parser.add_argument("--storage", choices=degrees.STORAGE_MODES, default="compact")
+    parser.add_argument("--snapshot", action="store_true")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory, storage=args.storage, snapshot=args.snapshot)
+    if args.source in degrees.people:
+        source = args.source
+    else:
+        source = degrees.person_id_for_name(args.source)
+        if source is None:
+            sys.exit(f"Unknown person: {args.source}")
+
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            counts = export(source, f)
+    else:
+        counts = export(source, sys.stdout)
+
+    for depth, count in enumerate(counts):
+        print(f"{count} people at {depth} degrees.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
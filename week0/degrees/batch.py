@@ -0,0 +1,148 @@
+"""
+Answer many degrees-of-separation queries in one job.
+
+Queries are grouped by source so that a single search from each unique
+source answers all of its targets, and the groups are spread across a
+process pool. Results are written as JSON lines as soon as each group
+finishes, so output order follows completion, not input order.
+
+Input is one JSON object per line with "source" and "target" person ids.
+
+Usage: python batch.py directory queries.jsonl [--output results.jsonl]
+"""
+
+import argparse
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import degrees
+from snapshot import load_snapshot
+from sqlitestore import open_database
+
+
+def read_queries(lines):
+    """
+    Yields (source, target) person id pairs from JSON lines.
+    """
+    for line in lines:
+        if line.strip():
+            query = json.loads(line)
+            yield str(query["source"]), str(query["target"])
+
+
+def group_by_source(queries):
+    """
+    Returns a dict mapping each source to its list of targets.
+    """
+    groups = {}
+    for source, target in queries:
+        groups.setdefault(source, []).append(target)
+    return groups
+
+
+def answer_group(source, targets):
+    """
+    Returns one result dict per target, all from a single search.
+    """
+    known = [target for target in targets if target in degrees.people]
+    if source in degrees.people:
+        paths = degrees.shortest_paths(source, known)
+    else:
+        paths = {}
+
+    results = []
+    for target in targets:
+        result = {"source": source, "target": target}
+        if source not in degrees.people or target not in degrees.people:
+            result["error"] = "unknown person"
+        else:
+            path = paths[target]
+            result["degrees"] = None if path is None else len(path)
+            result["path"] = path
+        results.append(result)
+    return results
+
+
+def run_batch(queries, workers=None, dataset=None):
+    """
+    Yields lists of result dicts for every (source, target) query, one
+    list per source group.
+
+    Without `workers`, groups are answered in this process against the
+    already loaded data. With `workers`, they run on a process pool and
+    `dataset` is the (directory, load_data options) pair each worker
+    loads first; a snapshot makes that nearly free.
+    """
+    groups = group_by_source(queries)
+
+    if not workers:
+        for source, targets in groups.items():
+            yield answer_group(source, targets)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=dataset,
+    ) as pool:
+        futures = [
+            pool.submit(answer_group, source, targets)
+            for source, targets in groups.items()
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def prepare(directory, storage="compact", snapshot=False):
+    """
+    Build or refresh the snapshot or SQLite database for `directory`
+    once, before any worker starts, so workers only ever read it.
+    """
+    if snapshot:
+        load_snapshot(directory)
+    elif storage == "sqlite":
+        open_database(directory).close()
+
+
+def _init_worker(directory, options):
+    degrees.load_data(directory, **options)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory")
+    parser.add_argument("queries", help="JSON lines file of queries, or - for stdin")
+    parser.add_argument("--output", help="file to write JSON lines results to")
+    parser.add_argument("--workers", type=int, help="number of worker processes")
+    parser.add_argument("--storage", choices=degrees.STORAGE_MODES, default="compact")
+    parser.add_argument("--snapshot", action="store_true")
+    args = parser.parse_args()
+
+    options = {"storage": args.storage, "snapshot": args.snapshot}
+    if not args.workers:
+        degrees.load_data(args.directory, **options)
+    else:
+        prepare(args.directory, **options)
+
+    if args.queries == "-":
+        queries = list(read_queries(sys.stdin))
+    else:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = list(read_queries(f))
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for results in run_batch(
+            queries, workers=args.workers, dataset=(args.directory, options)
+        ):
+            for result in results:
+                output.write(json.dumps(result) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Benchmark loading and the search modes of degrees.shortest_path.
+
+Loads a dataset, then runs the same random (source, target) queries
+through each mode, checking along the way that every mode finds paths
+of the same length. Reports load time, peak RSS, and per mode the nodes
+expanded, (movie, person) edges scanned and query latency percentiles,
+plus with --memory the most memory any one query allocated.
+
+Usage: python benchmark.py [directory] [--queries N] [--modes bfs,bipartite]
+                           [--storage compact] [--json results.jsonl]
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+import degrees
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+PERCENTILES = (50, 90, 99)
+
+
+def sample_queries(count, seed=0):
+    """
+    Returns `count` random (source, target) pairs of person ids
+    from the loaded dataset.
+    """
+    rng = random.Random(seed)
+    person_ids = sorted(degrees.people)
+    return [(rng.choice(person_ids), rng.choice(person_ids)) for _ in range(count)]
+
+
+def compare_modes(queries, modes, memory=False):
+    """
+    Run every query in each mode and return per-mode totals of
+    expanded nodes and scanned edges, plus every query's latency. With
+    `memory`, also record the peak bytes each query allocates, traced
+    with tracemalloc (which slows every query down).
+    """
+    results = {
+        mode: {"expanded": 0, "edges": 0, "latencies": [], "allocated": []}
+        for mode in modes
+    }
+    if memory:
+        tracemalloc.start()
+    for source, target in queries:
+        lengths = set()
+        for mode in modes:
+            stats = {}
+            if memory:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            path = degrees.shortest_path(source, target, mode=mode, stats=stats)
+            results[mode]["latencies"].append(time.perf_counter() - start)
+            if memory:
+                results[mode]["allocated"].append(tracemalloc.get_traced_memory()[1] - baseline)
+            results[mode]["expanded"] += stats["expanded"]
+            results[mode]["edges"] += stats["edges"]
+            lengths.add(None if path is None else len(path))
+        if len(lengths) != 1:
+            raise AssertionError(f"modes disagree for {source} -> {target}: {lengths}")
+    if memory:
+        tracemalloc.stop()
+    return results
+
+
+def percentiles(values, points=PERCENTILES):
+    """
+    Returns the nearest-rank percentiles of `values` as a dict.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return {f"p{point}": None for point in points}
+    return {
+        f"p{point}": ordered[min(len(ordered) - 1, len(ordered) * point // 100)]
+        for point in points
+    }
+
+
+def peak_rss_mb():
+    """
+    Returns this process's peak resident set size in MB, if known.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_benchmark(directory, storage, modes, count, seed=0, snapshot=False, memory=False):
+    """
+    Load `directory` and time `count` queries in each mode, returning
+    one JSON-friendly record of the results.
+    """
+    start = time.perf_counter()
+    degrees.load_data(directory, storage=storage, snapshot=snapshot)
+    load_seconds = time.perf_counter() - start
+    load_rss = peak_rss_mb()
+
+    queries = sample_queries(count, seed)
+    results = compare_modes(queries, modes, memory)
+
+    record = {
+        "directory": directory,
+        "storage": storage,
+        "snapshot": snapshot,
+        "memory": memory,
+        "people": len(degrees.people),
+        "queries": count,
+        "load_seconds": load_seconds,
+        "load_peak_rss_mb": load_rss,
+        "peak_rss_mb": peak_rss_mb(),
+        "modes": {},
+    }
+    if degrees.store is not None:
+        record["adjacency_cache"] = degrees.store.cache_info()
+    for mode, result in results.items():
+        latencies = result["latencies"]
+        record["modes"][mode] = {
+            "expanded": result["expanded"],
+            "edges": result["edges"],
+            "mean_seconds": sum(latencies) / len(latencies) if latencies else None,
+            **{f"{key}_seconds": value for key, value in percentiles(latencies).items()},
+        }
+        if memory:
+            record["modes"][mode]["max_allocated_mb"] = max(result["allocated"]) / 1e6
+    return record
+
+
+def print_record(record):
+    print(
+        f"Loaded {record['people']} people ({record['storage']}) in "
+        f"{record['load_seconds']:.2f} s, peak RSS {record['peak_rss_mb'] or 0:.0f} MB."
+    )
+    modes = record["modes"]
+    baseline = next(iter(modes.values()))["edges"] or 1
+    print(
+        f"{'mode':<14}{'expanded':>12}{'edges':>14}{'vs first':>10}"
+        + "".join(f"{f'p{point} ms':>10}" for point in PERCENTILES)
+        + (f"{'max MB':>10}" if record["memory"] else "")
+    )
+    for mode, result in modes.items():
+        print(
+            f"{mode:<14}{result['expanded']:>12}{result['edges']:>14}"
+            f"{result['edges'] / baseline:>10.2f}"
+            + "".join(
+                f"{(result[f'p{point}_seconds'] or 0) * 1000:>10.2f}"
+                for point in PERCENTILES
+            )
+            + (f"{result['max_allocated_mb']:>10.2f}" if record["memory"] else "")
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--modes", default="bfs,bipartite")
+    parser.add_argument("--storage", choices=degrees.STORAGE_MODES, default="compact")
+    parser.add_argument("--snapshot", action="store_true")
+    parser.add_argument("--memory", action="store_true",
+                        help="also trace the peak memory each query allocates")
+    parser.add_argument("--json", metavar="FILE", help="append the results as a JSON line")
+    args = parser.parse_args()
+
+    modes = args.modes.split(",")
+    for mode in modes:
+        if mode not in degrees.SEARCH_MODES:
+            parser.error(f"unknown search mode: {mode}")
+
+    print("Running benchmark...")
+    record = run_benchmark(
+        args.directory, args.storage, modes, args.queries, args.seed, args.snapshot,
+        args.memory,
+    )
+    print_record(record)
+
+    if args.json:
+        with open(args.json, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,31 @@
+import argparse
 import csv
+import heapq
+import json
+import logging
+import math
+import os
 import sys
+import time
+from array import array
+from collections import deque
+from functools import partial
+from itertools import islice
 
-from util import Node, StackFrontier, QueueFrontier
+from delta import Delta, merge_delta
+from graph import (
+    CompactGraph, DictGraph, FilteredGraph, MovieFilter, MoviesView, NamesView,
+    PeopleView, connected_components, join_components,
+)
+from ingest import load_parallel
+from landmarks import LandmarkIndex, landmarks_path
+from nameindex import NameIndex
+from treecache import UNREACHED, BFSTree, TreeCache
+from snapshot import load_snapshot, write_snapshot
+from sqlitestore import (
+    SQLiteComponents, SQLiteMovies, SQLiteNameIndex, SQLiteNames, SQLitePeople, open_database
+)
+from util import Node, DequeQueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,11 +36,106 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Maps person_ids to a connected component label, with dict storage
+components = {}
 
-def load_data(directory):
+# Number of people in each connected component, by label, with dict storage
+component_sizes = []
+
+# Prefix and fuzzy name lookups, built by load_data
+name_index = None
+
+# Integer-indexed graph, set when loading with compact storage
+graph = None
+
+# On-disk adjacency, set when loading with sqlite storage
+store = None
+
+# Landmark distance index over the compact graph, set by build_landmarks
+landmarks = None
+
+# LRU cache of per-source BFS trees, set by enable_tree_cache
+tree_cache = None
+
+# Compiled MovieFilter masks over the loaded movies, by filter
+filter_masks = {}
+
+# Dataset directory whose snapshot the compact graph was loaded from
+snapshot_directory = None
+
+STORAGE_MODES = ("dict", "compact", "sqlite")
+
+# Structured per-query search statistics, emitted by traced_shortest_path
+logger = logging.getLogger("degrees.search")
+
+
+class SearchLimitExceeded(Exception):
+    """
+    Raised when a search expands more nodes than its `max_expanded` budget.
+    """
+
+
+def load_data(directory, storage="dict", snapshot=False, workers=None):
     """
     Load data from CSV files into memory.
+
+    With `storage="compact"`, the data is kept in a CompactGraph and
+    `names`, `people` and `movies` become read-only views over it.
+    With `snapshot`, the compact graph is memory-mapped from a binary
+    snapshot of the directory, which is (re)built if missing or stale.
+    With `workers`, the compact graph is parsed on a pool of that many
+    processes.
+
+    With `storage="sqlite"`, the CSV files are imported once into an
+    SQLite database beside them and adjacency is fetched from it on
+    demand, so only a bounded cache of the graph is held in memory.
     """
+    global graph, names, people, movies, landmarks, components, component_sizes
+    global name_index, snapshot_directory, store
+
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"unknown storage mode: {storage}")
+    if (snapshot or workers) and storage != "compact":
+        raise ValueError("snapshots and parallel loading require compact storage")
+    landmarks = None
+    snapshot_directory = None
+    filter_masks.clear()
+    if tree_cache is not None:
+        tree_cache.clear()
+    if store is not None:
+        store.close()
+        store = None
+
+    if storage == "sqlite":
+        graph = None
+        store = open_database(directory)
+        names = SQLiteNames(store)
+        people = SQLitePeople(store)
+        movies = SQLiteMovies(store)
+        components = SQLiteComponents(store)
+        component_sizes = store.component_sizes()
+        name_index = SQLiteNameIndex(store)
+        return
+
+    if storage == "compact":
+        if workers:
+            build = partial(load_parallel, workers=workers)
+        else:
+            build = CompactGraph.from_csv
+        if snapshot:
+            graph = load_snapshot(directory, build=build)
+            snapshot_directory = directory
+        else:
+            graph = build(directory)
+        names = NamesView(graph)
+        people = PeopleView(graph)
+        movies = MoviesView(graph)
+        name_index = NameIndex.from_graph(graph)
+        return
+
+    graph = None
+    names, people, movies = {}, {}, {}
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -51,16 +170,273 @@ def load_data(directory):
             except KeyError:
                 pass
 
+    # Label connected components so disconnected pairs can be rejected
+    index = {person_id: i for i, person_id in enumerate(people)}
+    labels, component_sizes = connected_components(len(index), (
+        [index[person_id] for person_id in movie["stars"]]
+        for movie in movies.values()
+    ))
+    components = dict(zip(index, labels))
+
+    name_index = NameIndex.from_people(people)
+
+
+def apply_delta(directory):
+    """
+    Add the new people, movies and stars in a delta directory (see
+    delta.py) to the loaded data without reloading it. Component labels,
+    the name index and any landmark index are updated in place and the
+    tree cache is cleared. With compact storage loaded from a snapshot,
+    the snapshot is rewritten to include the delta. Returns the number
+    of people, movies and stars added, and of dangling stars skipped
+    for referencing unknown people or movies.
+    """
+    global name_index
+
+    if store is not None:
+        raise ValueError("deltas require dict or compact storage")
+    delta = Delta.read(directory)
+    filter_masks.clear()
+    if tree_cache is not None:
+        tree_cache.clear()
+
+    if graph is not None:
+        if delta.identifier in graph.deltas:
+            return {"people": 0, "movies": 0, "stars": 0, "dangling": 0}
+        counts, people_map, touched = merge_delta(graph, delta)
+        name_index = name_index.renumber(graph, people_map)
+        if landmarks is not None:
+            landmarks.update(graph, people_map, touched)
+        if snapshot_directory is not None:
+            write_snapshot(graph, snapshot_directory)
+        return counts
+
+    counts = {"people": 0, "movies": 0, "stars": 0, "dangling": 0}
+    added = []
+    for row in delta.people:
+        if row["id"] in people:
+            continue
+        people[row["id"]] = {"name": row["name"], "birth": row["birth"], "movies": set()}
+        names.setdefault(row["name"].lower(), set()).add(row["id"])
+        components[row["id"]] = len(component_sizes)
+        component_sizes.append(1)
+        added.append(row["id"])
+    counts["people"] = len(added)
+
+    for row in delta.movies:
+        if row["id"] not in movies:
+            movies[row["id"]] = {"title": row["title"], "year": row["year"], "stars": set()}
+            counts["movies"] += 1
+
+    # Unite the components of each movie's existing and new stars
+    casts = {}
+    for row in delta.stars:
+        person_id, movie_id = row["person_id"], row["movie_id"]
+        if person_id not in people or movie_id not in movies:
+            counts["dangling"] += 1
+            continue
+        stars = movies[movie_id]["stars"]
+        if person_id in stars:
+            continue
+        cast = casts.setdefault(movie_id, [components[star] for star in islice(stars, 1)])
+        cast.append(components[person_id])
+        stars.add(person_id)
+        people[person_id]["movies"].add(movie_id)
+        counts["stars"] += 1
+    relabel, sizes = join_components(component_sizes, casts.values())
+    if relabel is not None:
+        for person_id, label in components.items():
+            components[person_id] = relabel[label]
+        component_sizes[:] = sizes
+
+    name_index.add_people(added)
+    return counts
+
+
+def complete_name(prefix, limit=10):
+    """
+    Returns up to `limit` people whose name starts with `prefix`,
+    most prolific first, as dicts of id, name, birth and distance.
+    """
+    return name_index.prefix(prefix, limit)
+
+
+def find_names(query, max_distance=2, limit=10):
+    """
+    Returns up to `limit` people whose name is within `max_distance`
+    edits of `query`, closest and most prolific first, as dicts of id,
+    name, birth and distance. The trigram index behind this is built
+    on first use.
+    """
+    return name_index.fuzzy(query, max_distance, limit)
+
+
+def component_of(person_id):
+    """
+    Returns the connected component label of a person.
+    """
+    if graph is None:
+        return components[person_id]
+    return graph.component[graph.person_index(person_id)]
+
+
+def component_stats():
+    """
+    Returns summary statistics of the connected component sizes.
+    """
+    sizes = component_sizes if graph is None else graph.component_sizes
+    people_count = sum(sizes)
+    largest = max(sizes, default=0)
+    return {
+        "people": people_count,
+        "components": len(sizes),
+        "largest": largest,
+        "largest_fraction": largest / people_count if people_count else 0.0,
+        "singletons": sum(1 for size in sizes if size == 1),
+    }
+
+
+def build_landmarks(k=16, path=None, directory=None):
+    """
+    Build the landmark distance index for the loaded compact graph,
+    enabling `separation_bounds` and the "alt" search mode. If `path`
+    holds an index for this graph and the CSV files in `directory`
+    (by default, the directory of `path`) it is loaded instead;
+    otherwise the new index is saved there.
+    """
+    global landmarks
+
+    if graph is None:
+        raise ValueError("landmarks require compact storage")
+
+    if path is not None and directory is None:
+        directory = os.path.dirname(path) or "."
+    if path is not None and os.path.exists(path):
+        landmarks = LandmarkIndex.load(path, graph, directory)
+        if landmarks is not None:
+            return landmarks
+
+    landmarks = LandmarkIndex.build(graph, k)
+    if path is not None:
+        landmarks.save(path, graph, directory)
+    return landmarks
+
+
+def enable_tree_cache(max_bytes=256 * 1024 * 1024):
+    """
+    Keep the completed BFS tree of recent sources in an LRU cache of at
+    most `max_bytes`, so repeat sources (or targets) are answered by a
+    walk up the tree. Requires compact storage. Returns the cache, whose
+    `info()` reports hits, misses and memory use.
+    """
+    global tree_cache
+
+    if graph is None:
+        raise ValueError("the tree cache requires compact storage")
+    tree_cache = TreeCache(max_bytes)
+    return tree_cache
+
+
+def separation_bounds(source, target):
+    """
+    Returns (lower, upper) bounds on the degrees of separation between
+    two people from the landmark index, without searching. Both are
+    math.inf when the people are provably not connected.
+    """
+    if landmarks is None:
+        raise ValueError("no landmark index; call build_landmarks first")
+    return landmarks.bounds(graph.person_index(source), graph.person_index(target))
+
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(usage="python degrees.py [directory]")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--storage", choices=STORAGE_MODES, default="dict")
+    parser.add_argument("--mode", choices=SEARCH_MODES, default="bfs")
+    parser.add_argument(
+        "--snapshot", action="store_true",
+        help="load from a binary snapshot (implies --storage compact)"
+    )
+    parser.add_argument(
+        "--workers", type=int,
+        help="parse the CSV files on this many processes (implies --storage compact)"
+    )
+    parser.add_argument(
+        "--landmarks", type=int, metavar="K",
+        help="build a K-landmark distance index (implies --storage compact)"
+    )
+    parser.add_argument(
+        "--tree-cache", type=int, metavar="MB",
+        help="cache recent BFS trees in up to MB megabytes (implies --storage compact)"
+    )
+    parser.add_argument(
+        "--delta", action="append", default=[], metavar="DIR",
+        help="apply a directory of new people, movies and stars after loading"
+    )
+    parser.add_argument(
+        "--since", type=int, metavar="YEAR", help="only connect through movies from YEAR on"
+    )
+    parser.add_argument(
+        "--until", type=int, metavar="YEAR", help="only connect through movies up to YEAR"
+    )
+    parser.add_argument(
+        "--trace", metavar="FILE",
+        help="append each query's search statistics to FILE as JSON lines"
+    )
+    parser.add_argument(
+        "--all-paths", type=int, metavar="N",
+        help="list up to N equally short connections instead of one"
+    )
+    parser.add_argument(
+        "--k-paths", type=int, metavar="K",
+        help="list the K shortest connections, including longer alternatives"
+    )
+    parser.add_argument(
+        "--max-expanded", type=int, metavar="N",
+        help="give up on a query after expanding N people"
+    )
+    args = parser.parse_args()
+    if args.trace:
+        handler = logging.FileHandler(args.trace, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    if args.mode == "alt" and not args.landmarks:
+        args.landmarks = 16
+    if args.mode == "parents":
+        args.storage = "compact"
+    if args.snapshot or args.workers or args.landmarks or args.tree_cache:
+        args.storage = "compact"
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(
+        args.directory, storage=args.storage,
+        snapshot=args.snapshot, workers=args.workers
+    )
     print("Data loaded.")
+    for delta_directory in args.delta:
+        counts = apply_delta(delta_directory)
+        print(
+            f"Applied {delta_directory}: {counts['people']} people, "
+            f"{counts['movies']} movies and {counts['stars']} stars added, "
+            f"{counts['dangling']} dangling stars skipped."
+        )
+    summary = component_stats()
+    print(
+        f"{summary['people']} people in {summary['components']} components "
+        f"(largest: {summary['largest']})."
+    )
+    if graph is not None and graph.dangling_stars:
+        print(f"Skipped {graph.dangling_stars} star rows with unknown people or movies.")
+    if args.landmarks:
+        build_landmarks(args.landmarks, landmarks_path(args.directory), args.directory)
+    if args.tree_cache:
+        enable_tree_cache(args.tree_cache * 1024 * 1024)
+
+    movie_filter = None
+    if args.since is not None or args.until is not None:
+        movie_filter = MovieFilter(min_year=args.since, max_year=args.until)
 
     while True:
         source = person_id_for_name(input("Name: "))
@@ -70,19 +446,13 @@ def main():
         while target is None:
             target = person_id_for_name(input("Try again: "))
 
-        path = shortest_path(source, target)
-
-        if path is None:
-            print("Not connected.")
-        else:
-            degrees = len(path)
-            print(f"{degrees} degrees of separation.")
-            path = [(None, source)] + path
-            for i in range(degrees):
-                person1 = people[path[i][1]]["name"]
-                person2 = people[path[i + 1][1]]["name"]
-                movie = movies[path[i + 1][0]]["title"]
-                print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+        try:
+            if args.all_paths or args.k_paths:
+                list_paths(source, target, args, movie_filter)
+            else:
+                show_path(source, target, args, movie_filter)
+        except SearchLimitExceeded as e:
+            print(f"Stopped: {e}.")
 
         if (
             input("\nType 'no' to quit. Otherwise, press any key to keep playing... ")
@@ -91,6 +461,60 @@ def main():
             sys.exit
 
 
+def show_path(source, target, args, movie_filter):
+    path, stats = traced_shortest_path(
+        source, target, mode=args.mode,
+        max_expanded=args.max_expanded, movie_filter=movie_filter
+    )
+    if "expanded_forward" in stats:
+        print(
+            f"Expanded {stats['expanded_forward']} nodes from the source "
+            f"and {stats['expanded_backward']} from the target."
+        )
+    if "cache" in stats:
+        info = tree_cache.info()
+        print(
+            f"Tree cache {stats['cache']}: {info['hits']} hits, "
+            f"{info['misses']} misses, {info['bytes'] / 1e6:.1f} MB in "
+            f"{info['trees']} trees."
+        )
+
+    if path is None:
+        print("Not connected.")
+    else:
+        print_path(source, path)
+
+
+def list_paths(source, target, args, movie_filter):
+    if args.all_paths:
+        paths = islice(all_shortest_paths(
+            source, target, max_expanded=args.max_expanded, movie_filter=movie_filter
+        ), args.all_paths)
+    else:
+        paths = k_shortest_paths(
+            source, target, args.k_paths,
+            max_expanded=args.max_expanded, movie_filter=movie_filter
+        )
+
+    listed = 0
+    for listed, path in enumerate(paths, 1):
+        print(f"Connection {listed}: ", end="")
+        print_path(source, path)
+    if listed == 0:
+        print("Not connected.")
+
+
+def print_path(source, path):
+    degrees = len(path)
+    print(f"{degrees} degrees of separation.")
+    path = [(None, source)] + path
+    for i in range(degrees):
+        person1 = people[path[i][1]]["name"]
+        person2 = people[path[i + 1][1]]["name"]
+        movie = movies[path[i + 1][0]]["title"]
+        print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+
+
 def solution_steps(node):
 
     solution = []
@@ -104,60 +528,1002 @@ def solution_steps(node):
     return solution
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, mode="bfs", stats=None, max_expanded=None,
+                  movie_filter=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    `mode` selects the search algorithm (see SEARCH_MODES). If `stats`
+    is a dict, it is filled in with the number of nodes expanded,
+    (movie, person) edges scanned, the peak frontier size and a record
+    of each breadth-first layer (see traced_shortest_path). When the
+    tree cache is enabled, unfiltered queries are answered from it
+    instead and `stats` records a cache hit or miss. People in different
+    connected components are rejected without searching.
+
+    With a MovieFilter, only movies it keeps may appear on the path. Its
+    compiled mask is cached, so later queries with an equal filter reuse
+    it over the same base graph.
+
+    If the search expands more than `max_expanded` nodes, it stops with
+    SearchLimitExceeded. The budget does not apply to tree-cache builds.
+
     If no possible path, returns None.
     """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"unknown search mode: {mode}")
+    algorithm = SEARCH_MODES[mode]
+
+    # People in different components are never connected
+    if component_of(source) != component_of(target):
+        if stats is not None:
+            stats.update(expanded=0, edges=0, rejected="component")
+        return None
+
+    adjacency = _search_adjacency(movie_filter)
+    if graph is None:
+        return algorithm(source, target, adjacency, stats, max_expanded)
+
+    # Search over dense indices and translate the path back to IMDB ids
+    source, target = graph.person_index(source), graph.person_index(target)
+
+    # Answer from a cached BFS tree, building the source's tree on a miss
+    if tree_cache is not None and movie_filter is None:
+        path, hit = tree_cache.path(graph, source, target)
+        if stats is not None:
+            stats["cache"] = "hit" if hit else "miss"
+        return _path_ids(path)
+
+    return _path_ids(algorithm(source, target, adjacency, stats, max_expanded))
+
+
+def compile_filter(movie_filter):
+    """
+    Returns the mask of the loaded movies that `movie_filter` keeps,
+    compiling it on first use.
+    """
+    allowed = filter_masks.get(movie_filter)
+    if allowed is None:
+        if graph is None:
+            allowed = movie_filter.allowed(movies)
+        else:
+            allowed = movie_filter.mask(graph)
+        filter_masks[movie_filter] = allowed
+    return allowed
+
+
+def traced_shortest_path(source, target, mode="bfs", max_expanded=None, movie_filter=None):
+    """
+    Runs shortest_path and returns the path along with its search
+    statistics: nodes expanded, edges scanned, peak frontier size, the
+    nodes expanded and time taken by each breadth-first layer, and any
+    tree-cache hit. The statistics are also logged as one JSON message
+    on the "degrees.search" logger, including for searches that exceed
+    their budget.
+    """
+    stats = {"source": source, "target": target, "mode": mode}
+    start = time.perf_counter()
+    try:
+        path = shortest_path(source, target, mode, stats, max_expanded, movie_filter)
+    except SearchLimitExceeded:
+        stats.update(seconds=time.perf_counter() - start, degrees=None, limited=True)
+        logger.info(json.dumps(stats))
+        raise
+    stats.update(
+        seconds=time.perf_counter() - start, degrees=None if path is None else len(path)
+    )
+    logger.info(json.dumps(stats))
+    return path, stats
+
+
+def shortest_paths(source, targets, stats=None, max_expanded=None):
+    """
+    Returns a dict mapping each of `targets` to its shortest list of
+    (movie_id, person_id) pairs from the source, or None if it is not
+    connected, using a single search from the source.
+    """
+    component = component_of(source)
+    reachable = [target for target in targets if component_of(target) == component]
+    paths = dict.fromkeys(targets)
+    if graph is None:
+        paths.update(
+            multi_target_search(
+                source, reachable, _adjacency(), stats, max_expanded
+            )
+        )
+        return paths
+
+    states = {target: graph.person_index(target) for target in reachable}
+    found = multi_target_search(
+        graph.person_index(source), set(states.values()), graph, stats, max_expanded
+    )
+    paths.update((target, _path_ids(found[state])) for target, state in states.items())
+    return paths
+
+
+def separations(source):
+    """
+    Yields a (person_id, degrees, movie_id, predecessor_id) row for every
+    person connected to the source, nearest first, from one breadth-first
+    search; the predecessor starred with the person in the movie and is
+    one degree closer to the source. The source itself comes first, with
+    0 degrees and None for the movie and predecessor. Rows are produced as
+    people are reached, so no paths are held in memory.
+    """
+    if graph is None:
+        yield from separation_search(source, _adjacency())
+        return
+
+    for person, depth, movie, parent in separation_search(graph.person_index(source), graph):
+        if parent is None:
+            yield graph.person_id(person), depth, None, None
+        else:
+            yield graph.person_id(person), depth, graph.movie_id(movie), graph.person_id(parent)
+
+
+def all_shortest_paths(source, target, stats=None, max_expanded=None, movie_filter=None):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connects the source to the target, one at a time. A single
+    breadth-first search records each person's separation from the
+    source, up to the target's layer; paths are then enumerated backwards
+    from the target, so only the predecessors of people on some shortest
+    path are ever materialized. Yields nothing if there is no path.
+
+    `stats` and `max_expanded` span the search and the enumeration, in
+    which every step of the backward walk counts as an expansion. The
+    number of paths can grow exponentially with their length, so take
+    only as many as needed (e.g. with itertools.islice); once the budget
+    is exceeded, the generator raises SearchLimitExceeded after the
+    paths found so far.
+    """
+    if component_of(source) != component_of(target):
+        if stats is not None:
+            stats.update(expanded=0, edges=0, rejected="component")
+        return
+
+    # The enumeration adds to the search's totals, which the budget spans
+    if stats is None:
+        stats = {}
+    adjacency = _search_adjacency(movie_filter)
+    if graph is None:
+        depth = shortest_path_dag(source, target, adjacency, stats, max_expanded)
+        if depth is not None:
+            yield from dag_paths(source, target, adjacency, depth, stats, max_expanded)
+        return
+
+    source, target = graph.person_index(source), graph.person_index(target)
+    depth = shortest_path_dag(source, target, adjacency, stats, max_expanded)
+    if depth is not None:
+        for path in dag_paths(source, target, adjacency, depth, stats, max_expanded):
+            yield _path_ids(path)
+
+
+def k_shortest_paths(source, target, k=None, stats=None, max_expanded=None,
+                     movie_filter=None):
+    """
+    Yields up to `k` (or, if None, all) simple lists of (movie_id,
+    person_id) pairs that connect the source to the target, shortest
+    first, by Yen's algorithm. No person or movie appears twice in a
+    path. Paths of equal length come in no particular order.
+
+    `max_expanded` caps the nodes expanded across all of the searches
+    Yen's algorithm makes, counted in `stats`; once exceeded, the
+    generator raises SearchLimitExceeded after the paths found so far.
+    """
+    if component_of(source) != component_of(target):
+        if stats is not None:
+            stats.update(expanded=0, edges=0, rejected="component")
+        return
+
+    adjacency = _search_adjacency(movie_filter)
+    if graph is None:
+        yield from islice(yen_search(source, target, adjacency, stats, max_expanded), k)
+        return
+
+    source, target = graph.person_index(source), graph.person_index(target)
+    for path in islice(yen_search(source, target, adjacency, stats, max_expanded), k):
+        yield _path_ids(path)
+
+
+def _search_adjacency(movie_filter):
+    """
+    Returns the adjacency searches run over: the loaded graph,
+    restricted to the movies `movie_filter` keeps if given.
+    """
+    adjacency = _adjacency() if graph is None else graph
+    if movie_filter is not None:
+        adjacency = FilteredGraph(adjacency, compile_filter(movie_filter))
+    return adjacency
+
+
+def _adjacency():
+    """
+    Returns the IMDB id keyed adjacency of dict or sqlite storage.
+    """
+    if store is not None:
+        return store
+    return DictGraph(people, movies)
+
+
+def _path_ids(path):
+    """
+    Translate a path of dense (movie, person) indices to IMDB ids.
+    """
+    if path is None:
+        return None
+    return [(graph.movie_id(m), graph.person_id(p)) for m, p in path]
 
-    # Keep track of number of states explored
-    num_explored = 0
+
+def search(source, target, adjacency, stats=None, max_expanded=None):
+    """
+    Breadth-first search from source to target, where
+    `adjacency.neighbors(state)` yields (action, state) pairs.
+    Returns the list of (action, state) pairs leading to target, or None.
+    """
+    _start_stats(stats)
+    budget = _budget(max_expanded)
+
+    # Keep track of number of states explored and edges scanned
+    num_explored = edges = 0
 
     # Initialize frontier to just the starting position
     start = Node(state=source, parent=None, action=None)
-    frontier = QueueFrontier()
+    frontier = DequeQueueFrontier()
     frontier.add(start)
 
+    # Track where each breadth-first layer ends for the layer timings
+    layer_remaining = 1
+    layer_started = time.perf_counter()
+
     # Initialize an empty explored set
     explored = set()
 
     # Keep looping until solution found
+    try:
+        while True:
+
+            # If nothing left in frontier, then no path
+            if frontier.empty():
+                return None
+
+            # Choose a node from the frontier
+            node = frontier.remove()
+            num_explored += 1
+            if num_explored > budget:
+                _exceeded(budget)
+
+            # If node is the goal, then we have a solution
+            if node.state == target:
+                return solution_steps(node)
+
+            # Mark node as explored
+            explored.add(node.state)
+
+            # Add neighbors to frontier
+            for movie_person_pair in adjacency.neighbors(node.state):
+                edges += 1
+                action, state = movie_person_pair[0], movie_person_pair[1]
+                if not frontier.contains_state(state) and state not in explored:
+                    child = Node(state=state, parent=node, action=action)
+                    if child.state == target:
+                        return solution_steps(child)
+                    frontier.add(child)
+
+            layer_remaining -= 1
+            if layer_remaining == 0:
+                if stats is not None:
+                    layer_started = _end_layer(
+                        stats, num_explored, len(frontier), layer_started
+                    )
+                layer_remaining = len(frontier)
+    finally:
+        _count(stats, num_explored, edges)
+
+
+def bidirectional_search(source, target, adjacency, stats=None, max_expanded=None):
+    """
+    Breadth-first search from both ends at once, always expanding
+    whichever frontier is smaller by one full layer, until they meet.
+
+    Relies on the co-star graph being undirected, so `adjacency.neighbors`
+    serves for both directions. Returns the same (action, state) list as
+    `search`, and records the nodes expanded from each end in `stats`.
+    """
+    _start_stats(stats)
+    budget = _budget(max_expanded)
+    expanded = edges = 0
+    expanded_by = {"forward": 0, "backward": 0}
+    if stats is not None:
+        stats.update(expanded_forward=0, expanded_backward=0)
+
+    if source == target:
+        return []
+
+    # Each side maps a visited state to (neighbor, action, distance),
+    # where neighbor is the state it was reached from
+    forward = {source: (None, None, 0)}
+    backward = {target: (None, None, 0)}
+    forward_layer, backward_layer = [source], [target]
+    layer_started = time.perf_counter()
+
+    try:
+        while forward_layer and backward_layer:
+
+            # Expand the smaller frontier
+            if len(forward_layer) <= len(backward_layer):
+                visited, other, layer, direction = forward, backward, forward_layer, "forward"
+            else:
+                visited, other, layer, direction = backward, forward, backward_layer, "backward"
+
+            # Finish the whole layer, keeping the shortest meeting point
+            best, meeting = None, None
+            next_layer = []
+            for state in layer:
+                expanded += 1
+                expanded_by[direction] += 1
+                if expanded > budget:
+                    _exceeded(budget)
+                distance = visited[state][2] + 1
+                for action, neighbor in adjacency.neighbors(state):
+                    edges += 1
+                    if neighbor in visited:
+                        continue
+                    visited[neighbor] = (state, action, distance)
+                    next_layer.append(neighbor)
+                    if neighbor in other:
+                        length = distance + other[neighbor][2]
+                        if best is None or length < best:
+                            best, meeting = length, neighbor
+
+            if stats is not None:
+                layer_started = _end_layer(
+                    stats, expanded, len(next_layer), layer_started, direction
+                )
+            if meeting is not None:
+                return _join_paths(forward, backward, meeting)
+
+            if visited is forward:
+                forward_layer = next_layer
+            else:
+                backward_layer = next_layer
+
+        return None
+    finally:
+        _count(stats, expanded, edges)
+        if stats is not None:
+            stats.update(
+                expanded_forward=expanded_by["forward"],
+                expanded_backward=expanded_by["backward"],
+            )
+
+
+def _start_stats(stats):
+    """
+    Reset the counters every search records, if `stats` was asked for.
+    Searches count in local variables and write the totals back with
+    `_count`, so queries without stats pay nothing per edge.
+    """
+    if stats is not None:
+        stats.update(expanded=0, edges=0, peak_frontier=0, layers=[])
+
+
+def _count(stats, expanded, edges):
+    """
+    Write a search's node and edge counts into `stats`, if asked for.
+    """
+    if stats is not None:
+        stats["expanded"] = expanded
+        stats["edges"] = edges
+
+
+def _end_layer(stats, expanded, frontier, started, direction=None):
+    """
+    Record a finished breadth-first layer in `stats`: the nodes it
+    expanded (out of `expanded` so far), the size of the frontier it
+    left and the time it took. Returns the time the next layer starts.
+    """
+    now = time.perf_counter()
+    layers = stats["layers"]
+    layer = {
+        "depth": 1 + sum(1 for previous in layers if previous.get("direction") == direction),
+        "expanded": expanded - sum(previous["expanded"] for previous in layers),
+        "frontier": frontier,
+        "seconds": now - started,
+    }
+    if direction is not None:
+        layer["direction"] = direction
+    layers.append(layer)
+    if frontier > stats["peak_frontier"]:
+        stats["peak_frontier"] = frontier
+    return now
+
+
+def _budget(max_expanded):
+    """
+    Returns the expansion budget as a number to compare counts against.
+    """
+    return math.inf if max_expanded is None else max_expanded
+
+
+def _exceeded(budget):
+    raise SearchLimitExceeded(f"search expanded more than {budget} nodes")
+
+
+def _join_paths(forward, backward, meeting):
+    """
+    Rebuild the (action, state) path from the two parent maps
+    of a bidirectional search that met at `meeting`.
+    """
+    path = []
+    state = meeting
+    while forward[state][0] is not None:
+        parent, action, _ = forward[state]
+        path.append((action, state))
+        state = parent
+    path.reverse()
+
+    state = meeting
+    while backward[state][0] is not None:
+        child, action, _ = backward[state]
+        path.append((action, child))
+        state = child
+    return path
+
+
+def bipartite_search(source, target, adjacency, stats=None, max_expanded=None):
+    """
+    Breadth-first search over the person <-> movie bipartite graph.
+
+    Movies are nodes with their own visited set, so each movie's cast
+    is scanned at most once per query instead of once for every cast
+    member who reaches it. Returns the same (action, state) list as
+    `search`.
+    """
+    _start_stats(stats)
+    budget = _budget(max_expanded)
+    expanded = edges = 0
+
+    if source == target:
+        return []
+
+    # Maps each reached person to the (movie, person) it was reached from
+    parents = {source: None}
+    visited_movies = set()
+    frontier = deque([source])
+    layer_remaining = 1
+    layer_started = time.perf_counter()
+
+    try:
+        while frontier:
+            person = frontier.popleft()
+            expanded += 1
+            if expanded > budget:
+                _exceeded(budget)
+
+            for movie in adjacency.movies_of(person):
+                if movie in visited_movies:
+                    continue
+                visited_movies.add(movie)
+
+                for star in adjacency.stars_of(movie):
+                    edges += 1
+                    if star in parents:
+                        continue
+                    parents[star] = (movie, person)
+                    if star == target:
+                        return _parent_path(parents, target)
+                    frontier.append(star)
+
+            layer_remaining -= 1
+            if layer_remaining == 0:
+                if stats is not None:
+                    layer_started = _end_layer(stats, expanded, len(frontier), layer_started)
+                layer_remaining = len(frontier)
+
+        return None
+    finally:
+        _count(stats, expanded, edges)
+
+
+def parent_array_search(source, target, adjacency, stats=None, max_expanded=None):
+    """
+    Bipartite breadth-first search that allocates no per-state objects:
+    the parent person and movie of each reached person are kept in
+    integer arrays indexed by dense person id, visited movies in a
+    bytearray and each layer in an integer array. Requires compact
+    storage. Returns the same (action, state) list as `search`.
+    """
+    if graph is None:
+        raise ValueError("parents mode requires compact storage")
+    _start_stats(stats)
+    budget = _budget(max_expanded)
+    expanded = edges = 0
+
+    if source == target:
+        return []
+
+    parent_person = array("i", [UNREACHED]) * graph.num_people
+    parent_movie = array("i", [UNREACHED]) * graph.num_people
+    visited_movies = bytearray(graph.num_movies)
+    parent_person[source] = source
+    layer = array("i", [source])
+    layer_started = time.perf_counter()
+
+    try:
+        while layer:
+            next_layer = array("i")
+            for person in layer:
+                expanded += 1
+                if expanded > budget:
+                    _exceeded(budget)
+
+                for movie in adjacency.movies_of(person):
+                    if visited_movies[movie]:
+                        continue
+                    visited_movies[movie] = 1
+
+                    for star in adjacency.stars_of(movie):
+                        edges += 1
+                        if parent_person[star] != UNREACHED:
+                            continue
+                        parent_person[star] = person
+                        parent_movie[star] = movie
+                        if star == target:
+                            tree = BFSTree(source, parent_person, parent_movie)
+                            return tree.path_from_root(target)
+                        next_layer.append(star)
+
+            if stats is not None:
+                layer_started = _end_layer(stats, expanded, len(next_layer), layer_started)
+            layer = next_layer
+
+        return None
+    finally:
+        _count(stats, expanded, edges)
+
+
+def alt_search(source, target, adjacency, stats=None, max_expanded=None):
+    """
+    A* search guided by the landmark index (ALT): the heuristic is the
+    landmark lower bound on each person's separation from the target.
+    Requires compact storage and `build_landmarks`. Bounds from the full
+    graph stay admissible over a FilteredGraph, whose distances can only
+    be longer.
+    """
+    if landmarks is None or graph is None:
+        raise ValueError("alt mode requires compact storage and build_landmarks")
+    _start_stats(stats)
+    budget = _budget(max_expanded)
+    expanded = edges = peak_frontier = 0
+
+    h = landmarks.heuristic(target)
+    if h(source) == math.inf:
+        return None
+
+    # Frontier of (f, g, person) with lazy deletion of stale entries
+    parents = {source: None}
+    cost = {source: 0}
+    frontier = [(h(source), 0, source)]
+    closed = set()
+
+    try:
+        while frontier:
+            _, g, person = heapq.heappop(frontier)
+            if person in closed:
+                continue
+            if person == target:
+                return _parent_path(parents, target)
+            closed.add(person)
+            expanded += 1
+            if expanded > budget:
+                _exceeded(budget)
+            if len(frontier) > peak_frontier:
+                peak_frontier = len(frontier)
+
+            for movie, star in adjacency.neighbors(person):
+                edges += 1
+                if star in closed or cost.get(star, math.inf) <= g + 1:
+                    continue
+                estimate = h(star)
+                if estimate == math.inf:
+                    continue
+                cost[star] = g + 1
+                parents[star] = (movie, person)
+                heapq.heappush(frontier, (g + 1 + estimate, g + 1, star))
+
+        return None
+    finally:
+        _count(stats, expanded, edges)
+        if stats is not None:
+            stats["peak_frontier"] = peak_frontier
+
+
+def multi_target_search(source, targets, adjacency, stats=None, max_expanded=None):
+    """
+    Bipartite breadth-first search from source that stops once every
+    state in `targets` has been reached. Returns a dict mapping each
+    target to its (action, state) path, or None if unreachable.
+    """
+    _start_stats(stats)
+    budget = _budget(max_expanded)
+    expanded = edges = 0
+
+    remaining = set(targets)
+    parents = {source: None}
+    remaining.discard(source)
+    visited_movies = set()
+    frontier = deque([source])
+    layer_remaining = 1
+    layer_started = time.perf_counter()
+
+    try:
+        while frontier and remaining:
+            person = frontier.popleft()
+            expanded += 1
+            if expanded > budget:
+                _exceeded(budget)
+
+            for movie in adjacency.movies_of(person):
+                if movie in visited_movies:
+                    continue
+                visited_movies.add(movie)
+
+                for star in adjacency.stars_of(movie):
+                    edges += 1
+                    if star in parents:
+                        continue
+                    parents[star] = (movie, person)
+                    remaining.discard(star)
+                    frontier.append(star)
+
+            layer_remaining -= 1
+            if layer_remaining == 0:
+                if stats is not None:
+                    layer_started = _end_layer(stats, expanded, len(frontier), layer_started)
+                layer_remaining = len(frontier)
+    finally:
+        _count(stats, expanded, edges)
+
+    return {
+        target: _parent_path(parents, target) if target in parents else None
+        for target in targets
+    }
+
+
+def separation_search(source, adjacency):
+    """
+    Layered bipartite breadth-first search over every state reachable
+    from source. Yields (state, depth, action, parent) as each state is
+    first reached, starting with (source, 0, None, None).
+    """
+    yield source, 0, None, None
+    visited = {source}
+    visited_movies = set()
+    layer = [source]
+    depth = 0
+
+    while layer:
+        depth += 1
+        next_layer = []
+        for person in layer:
+            for movie in adjacency.movies_of(person):
+                if movie in visited_movies:
+                    continue
+                visited_movies.add(movie)
+
+                for star in adjacency.stars_of(movie):
+                    if star in visited:
+                        continue
+                    visited.add(star)
+                    next_layer.append(star)
+                    yield star, depth, movie, person
+        layer = next_layer
+
+
+def shortest_path_dag(source, target, adjacency, stats=None, max_expanded=None):
+    """
+    Bipartite breadth-first search from source that stops once target is
+    reached. Returns a dict mapping each reached state to its distance
+    from source, which, together with `adjacency`, encodes the layer DAG
+    of all shortest paths (see dag_paths), or None if target is
+    unreachable. Every state closer than target is final when it stops.
+    """
+    _start_stats(stats)
+    budget = _budget(max_expanded)
+    expanded = edges = 0
+
+    depth = {source: 0}
+    if source == target:
+        return depth
+    visited_movies = set()
+    layer = [source]
+    layer_started = time.perf_counter()
+
+    try:
+        while layer:
+            next_layer = []
+            for person in layer:
+                expanded += 1
+                if expanded > budget:
+                    _exceeded(budget)
+                distance = depth[person] + 1
+
+                for movie in adjacency.movies_of(person):
+                    if movie in visited_movies:
+                        continue
+                    visited_movies.add(movie)
+
+                    for star in adjacency.stars_of(movie):
+                        edges += 1
+                        if star in depth:
+                            continue
+                        depth[star] = distance
+                        if star == target:
+                            if stats is not None:
+                                _end_layer(stats, expanded, len(next_layer), layer_started)
+                            return depth
+                        next_layer.append(star)
+
+            if stats is not None:
+                layer_started = _end_layer(stats, expanded, len(next_layer), layer_started)
+            layer = next_layer
+
+        return None
+    finally:
+        _count(stats, expanded, edges)
+
+
+def dag_paths(source, target, adjacency, depth, stats=None, max_expanded=None):
+    """
+    Yields every shortest (action, state) path from source to target in
+    the layer DAG given by the `depth` map of shortest_path_dag, by
+    depth-first search backwards from target. The predecessors of a
+    state, the (movie, co-star) pairs one layer closer to source, are
+    found the first time it is visited and kept for later paths.
+
+    Each step of the walk counts as an expansion and each co-star scanned
+    for predecessors as an edge, added to the totals already in `stats`;
+    past `max_expanded` expansions in all, it raises SearchLimitExceeded.
+    """
+    if source == target:
+        yield []
+        return
+
+    budget = _budget(max_expanded)
+    if stats is not None:
+        budget -= stats["expanded"]
+    expanded = edges = 0
+    predecessors = {}
+
+    def predecessors_of(person):
+        nonlocal edges
+        found = predecessors.get(person)
+        if found is None:
+            distance = depth[person] - 1
+            # Compact storage keeps duplicate star rows, so drop repeats
+            found = {}
+            for movie in adjacency.movies_of(person):
+                for star in adjacency.stars_of(movie):
+                    edges += 1
+                    if depth.get(star) == distance:
+                        found[movie, star] = None
+            found = predecessors[person] = list(found)
+        return found
+
+    def count():
+        # Add the counts since the last report to the totals
+        nonlocal expanded, edges, budget
+        if stats is not None:
+            stats["expanded"] += expanded
+            stats["edges"] += edges
+        budget -= expanded
+        expanded = edges = 0
+
+    # The people from target back towards source, each with an iterator
+    # over its remaining predecessors, and the steps between them
+    people = [target]
+    remaining = [iter(predecessors_of(target))]
+    steps = []
+    try:
+        while remaining:
+            step = next(remaining[-1], None)
+            if step is None:
+                remaining.pop()
+                people.pop()
+                if steps:
+                    steps.pop()
+                continue
+
+            expanded += 1
+            if expanded > budget:
+                _exceeded(max_expanded)
+            movie, parent = step
+            steps.append((movie, people[-1]))
+            if parent == source:
+                # Report the counts so far, as the caller may stop here
+                count()
+                yield steps[::-1]
+                steps.pop()
+            else:
+                people.append(parent)
+                remaining.append(iter(predecessors_of(parent)))
+    finally:
+        count()
+
+
+def yen_search(source, target, adjacency, stats=None, max_expanded=None):
+    """
+    Yields the simple (action, state) paths from source to target in
+    order of length, by Yen's algorithm over the person <-> movie
+    bipartite graph: each path after the first is the shortest deviation
+    from one already found, branching off at one of its people or movies
+    (the "spur") without revisiting anything before that point or taking
+    an edge that a found path with the same prefix takes from it.
+    `max_expanded` caps the expansions of all spur searches together.
+    """
+    # Spur searches add their counts to these totals, which the budget spans
+    if stats is None:
+        stats = {}
+    _start_stats(stats)
+    stats["spur_searches"] = 1
+
+    first = _spur_search(source, target, adjacency, set(), set(), set(), stats, max_expanded)
+    if first is None:
+        return
+    found = [first]
+    seen = {tuple(first)}
+    candidates = []
+    counter = 0
+    yield first
+
     while True:
+        previous = found[-1]
 
-        # If nothing left in frontier, then no path
-        if frontier.empty():
-            return None
+        # Spur at each person of the path but target, then at the movie after it
+        for i in range(len(previous)):
+            root = previous[:i]
+            person = source if i == 0 else root[-1][1]
+            movie = previous[i][0]
+            siblings = [path for path in found if len(path) > i and path[:i] == root]
+            blocked_people = {source}.union(state for _, state in root)
+            blocked_movies = {action for action, _ in root}
 
-        # Choose a node from the frontier
-        node = frontier.remove()
-        num_explored += 1
+            spurs = (
+                (None, {path[i][0] for path in siblings}),
+                (movie, {path[i][1] for path in siblings if path[i][0] == movie}),
+            )
+            for spur_movie, removed in spurs:
+                stats["spur_searches"] += 1
+                tail = _spur_search(
+                    person, target, adjacency, blocked_people, blocked_movies,
+                    removed, stats, max_expanded, spur_movie,
+                )
+                if tail is None:
+                    continue
+                path = root + tail
+                if tuple(path) in seen:
+                    continue
+                seen.add(tuple(path))
+                counter += 1
+                heapq.heappush(candidates, (len(path), counter, path))
 
-        # If node is the goal, then we have a solution
-        if node.state == target:
-            return solution_steps(node)
+        if not candidates:
+            return
+        _, _, path = heapq.heappop(candidates)
+        found.append(path)
+        yield path
 
-        # Mark node as explored
-        explored.add(node.state)
 
-        # Add neighbors to frontier
-        for movie_person_pair in neighbors_for_person(node.state):
-            action, state = movie_person_pair[0], movie_person_pair[1]
-            if not frontier.contains_state(state) and state not in explored:
-                child = Node(state=state, parent=node, action=action)
-                if child.state == target:
-                    return solution_steps(child)
-                frontier.add(child)
+def _spur_search(source, target, adjacency, blocked_people, blocked_movies, removed,
+                 stats, max_expanded, movie=None):
+    """
+    Bipartite breadth-first search for yen_search that avoids the states
+    in `blocked_people` and the movies in `blocked_movies`. Without
+    `movie`, the search leaves source by any movie not in `removed`;
+    with it, source has already taken `movie` and continues to any of
+    its stars not in `removed`. Adds its counts to the totals in `stats`
+    without resetting them, so the budget spans every spur search of a
+    query.
+    """
+    if source == target:
+        return []
+
+    budget = _budget(max_expanded) - stats["expanded"]
+    expanded = edges = peak_frontier = 0
+    parents = dict.fromkeys(blocked_people, None)
+    parents[source] = None
+    visited_movies = set(blocked_movies)
+    frontier = deque()
+
+    try:
+        if movie is None:
+            frontier.append(source)
+        else:
+            visited_movies.add(movie)
+            for star in adjacency.stars_of(movie):
+                edges += 1
+                if star in parents or star in removed:
+                    continue
+                parents[star] = (movie, source)
+                if star == target:
+                    return _parent_path(parents, target)
+                frontier.append(star)
+
+        while frontier:
+            person = frontier.popleft()
+            expanded += 1
+            if expanded > budget:
+                _exceeded(max_expanded)
+
+            for movie in adjacency.movies_of(person):
+                if movie in visited_movies or person == source and movie in removed:
+                    continue
+                visited_movies.add(movie)
+
+                for star in adjacency.stars_of(movie):
+                    edges += 1
+                    if star in parents:
+                        continue
+                    parents[star] = (movie, person)
+                    if star == target:
+                        return _parent_path(parents, target)
+                    frontier.append(star)
+            if len(frontier) > peak_frontier:
+                peak_frontier = len(frontier)
+
+        return None
+    finally:
+        stats["expanded"] += expanded
+        stats["edges"] += edges
+        if peak_frontier > stats["peak_frontier"]:
+            stats["peak_frontier"] = peak_frontier
+
+
+def _parent_path(parents, state):
+    """
+    Rebuild the (action, state) path to `state` from a map
+    of state -> (action, parent state).
+    """
+    path = []
+    while parents[state] is not None:
+        action, parent = parents[state]
+        path.append((action, state))
+        state = parent
+    path.reverse()
+    return path
+
+
+# Search algorithms selectable by name in shortest_path
+SEARCH_MODES = {
+    "bfs": search,
+    "bidirectional": bidirectional_search,
+    "bipartite": bipartite_search,
+    "alt": alt_search,
+    "parents": parent_array_search,
+}
 
 
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
-    resolving ambiguities as needed.
+    resolving ambiguities and misspellings as needed.
     """
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
+        candidates = find_names(name, limit=5) if name_index is not None else []
+        if len(candidates) == 0:
+            return None
+        print(f"No one named '{name}'. Did you mean:")
+        for candidate in candidates:
+            print(
+                f"ID: {candidate['id']}, Name: {candidate['name']}, "
+                f"Birth: {candidate['birth']}"
+            )
+        person_id = input("Intended Person ID: ")
+        if person_id in {candidate["id"] for candidate in candidates}:
+            return person_id
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
@@ -182,6 +1548,11 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors_for_person(person_id)
+    if store is not None:
+        return store.neighbors_for_person(person_id)
+
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
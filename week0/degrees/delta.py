@@ -0,0 +1,260 @@
+"""
+Append-only dataset updates for a CompactGraph.
+
+A delta is a directory holding any of people.csv, movies.csv and
+stars.csv, in the dataset's format, with only new rows. Merging one
+splices the new people and movies into the graph's sorted columns and
+re-counts the adjacency from its existing arrays, so the base CSV files
+are never read again. Component labels are updated by uniting just the
+components the new stars join; indexes keyed by dense person index,
+such as landmarks, are shifted with the returned Remap.
+
+Usage: python delta.py directory delta [delta ...]
+"""
+
+import argparse
+import csv
+import hashlib
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+
+from graph import join_components, parse_id, parse_year
+from landmarks import LandmarkIndex, landmarks_path
+from snapshot import SOURCES, load_snapshot, write_snapshot
+
+
+class Delta():
+    """
+    The rows of a delta directory, as lists of CSV row dicts.
+    """
+
+    def __init__(self, identifier, people, movies, stars):
+        self.identifier = identifier
+        self.people = people
+        self.movies = movies
+        self.stars = stars
+
+    @classmethod
+    def read(cls, directory):
+        """
+        Read the CSV files present in `directory`. The delta is identified
+        by a hash of their contents, so re-applying it can be detected.
+        """
+        digest = hashlib.sha256()
+        rows = {}
+        for name in SOURCES:
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                rows[name] = []
+                continue
+            with open(path, "rb") as f:
+                digest.update(name.encode("utf-8") + b"\0" + f.read() + b"\0")
+            with open(path, encoding="utf-8") as f:
+                rows[name] = list(csv.DictReader(f))
+        return cls(digest.hexdigest(), *(rows[name] for name in SOURCES))
+
+
+class Remap():
+    """
+    Maps the `size` old dense indices of a column to new ones after an
+    entry is inserted before each old index in `points`, which must be
+    sorted.
+    """
+
+    def __init__(self, points, size):
+        self.points = points
+
+        # New index of each of the `size` old indices
+        self.table = array("i")
+        start = 0
+        for shift, point in enumerate(points + [size]):
+            self.table.extend(array("i", range(start + shift, point + shift)))
+            start = point
+
+    def __getitem__(self, i):
+        return self.table[i]
+
+    def inserted(self):
+        """
+        Returns the new dense indices of the inserted entries.
+        """
+        return [point + j for j, point in enumerate(self.points)]
+
+    def splice(self, column, values):
+        """
+        Returns a copy of `column` with `values` inserted at the points.
+        Array columns stay arrays; anything else becomes a list.
+        """
+        if isinstance(column, array):
+            spliced = array(column.typecode)
+        elif isinstance(column, memoryview):
+            spliced = array(column.format)
+        else:
+            spliced, column = [], list(column)
+        start = 0
+        for point, value in zip(self.points, values):
+            spliced.extend(column[start:point])
+            spliced.append(value)
+            start = point
+        spliced.extend(column[start:])
+        return spliced
+
+
+def merge_delta(graph, delta):
+    """
+    Merge `delta` into `graph` in place. Rows for ids the graph already
+    has, and stars it already records, are skipped; stars that reference
+    unknown ids are counted as dangling. Returns (counts, remap, movies):
+    the number of people, movies and stars added and of dangling stars
+    skipped, the Remap of old dense people to new, and the new dense
+    indices of movies that gained stars.
+    """
+    # New people and movies, in id order
+    people = sorted({
+        parse_id(row["id"]): (row["name"], parse_year(row["birth"]))
+        for row in delta.people if graph.person_index(row["id"]) is None
+    }.items())
+    movies = sorted({
+        parse_id(row["id"]): (row["title"], parse_year(row["year"]))
+        for row in delta.movies if graph.movie_index(row["id"]) is None
+    }.items())
+    new_people = {person_id for person_id, _ in people}
+    new_movies = {movie_id for movie_id, _ in movies}
+
+    # New stars as id pairs, with the old index of their movie if it had one
+    stars = {}
+    dangling = 0
+    for row in delta.stars:
+        p, m = graph.person_index(row["person_id"]), graph.movie_index(row["movie_id"])
+        if p is None and parse_id(row["person_id"]) not in new_people \
+                or m is None and parse_id(row["movie_id"]) not in new_movies:
+            dangling += 1
+            continue
+        if p is not None and m is not None and m in graph.movies_of(p):
+            continue
+        stars[parse_id(row["person_id"]), parse_id(row["movie_id"])] = m
+
+    # Existing stars, renumbered around the inserted people and movies
+    people_map = Remap(
+        [bisect_left(graph.person_ids, person_id) for person_id, _ in people],
+        graph.num_people,
+    )
+    movies_map = Remap(
+        [bisect_left(graph.movie_ids, movie_id) for movie_id, _ in movies],
+        graph.num_movies,
+    )
+    star_people = array("i")
+    for p in range(graph.num_people):
+        count = graph.person_offsets[p + 1] - graph.person_offsets[p]
+        star_people.extend(array("i", [people_map[p]]) * count)
+    if movies:
+        star_movies = array("i", (movies_map[m] for m in graph.person_movies))
+    else:
+        star_movies = array("i", graph.person_movies)
+
+    # Component labels of existing people, plus a new one for each new person
+    labels = len(graph.component_sizes)
+    component = people_map.splice(graph.component, range(labels, labels + len(people)))
+    sizes = array("i", graph.component_sizes)
+    sizes.extend(array("i", [1]) * len(people))
+
+    # One representative old star of each movie gaining stars, new numbering
+    representatives = {}
+    for old in set(stars.values()):
+        if old is not None and graph.movie_offsets[old + 1] > graph.movie_offsets[old]:
+            first = graph.movie_people[graph.movie_offsets[old]]
+            representatives[movies_map[old]] = people_map[first]
+
+    # Splice the new people and movies into the sorted columns
+    names = graph.person_names
+    graph.person_ids = people_map.splice(graph.person_ids, [p[0] for p in people])
+    graph.person_names = people_map.splice(names, [p[1][0] for p in people])
+    graph.person_births = people_map.splice(graph.person_births, [p[1][1] for p in people])
+    graph.movie_ids = movies_map.splice(graph.movie_ids, [m[0] for m in movies])
+    graph.movie_titles = movies_map.splice(graph.movie_titles, [m[1][0] for m in movies])
+    graph.movie_years = movies_map.splice(graph.movie_years, [m[1][1] for m in movies])
+
+    # Insert the new people into the name order
+    key = lambda p: graph.person_names[p].lower()
+    inserted = sorted(people_map.inserted(), key=key)
+    name_order = array("i", (people_map[p] for p in graph.name_order))
+    points = [bisect_right(name_order, key(p), key=key) for p in inserted]
+    graph.name_order = Remap(points, len(name_order)).splice(name_order, inserted)
+
+    # Append the new stars and unite the components of each movie's cast
+    casts = {}
+    for person_id, movie_id in stars:
+        p, m = graph.person_index(person_id), graph.movie_index(movie_id)
+        star_people.append(p)
+        star_movies.append(m)
+        casts.setdefault(m, [representatives[m]] if m in representatives else []).append(p)
+    relabel, sizes = join_components(
+        sizes, ([component[p] for p in cast] for cast in casts.values())
+    )
+    if relabel is not None:
+        component = array("i", (relabel[label] for label in component))
+
+    graph.build_adjacency(star_people, star_movies)
+    graph.component, graph.component_sizes = component, sizes
+    graph.deltas = list(graph.deltas) + [delta.identifier]
+
+    graph.dangling_stars += dangling
+    counts = {
+        "people": len(people), "movies": len(movies), "stars": len(stars),
+        "dangling": dangling,
+    }
+    return counts, people_map, sorted(casts)
+
+
+def update_snapshot(directory, deltas):
+    """
+    Apply each delta directory in `deltas` to the snapshot of the dataset
+    in `directory`, building the snapshot first if needed, and keep a
+    saved landmark index in step. Deltas the snapshot already includes
+    are skipped. Returns the counts added by each delta.
+    """
+    graph = load_snapshot(directory)
+    path = landmarks_path(directory)
+    index = None
+    if os.path.exists(path):
+        index = LandmarkIndex.load(path, graph, directory)
+
+    results = []
+    for delta_directory in deltas:
+        delta = Delta.read(delta_directory)
+        if delta.identifier in graph.deltas:
+            results.append(None)
+            continue
+        counts, people_map, movies = merge_delta(graph, delta)
+        if index is not None:
+            index.update(graph, people_map, movies)
+        results.append(counts)
+
+    if any(counts is not None for counts in results):
+        write_snapshot(graph, directory)
+        if index is not None:
+            index.save(path, graph, directory)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", help="dataset whose snapshot to update")
+    parser.add_argument("deltas", nargs="+", help="delta directories, oldest first")
+    args = parser.parse_args()
+
+    results = update_snapshot(args.directory, args.deltas)
+    for delta_directory, counts in zip(args.deltas, results):
+        if counts is None:
+            print(f"{delta_directory}: already applied.")
+        else:
+            print(
+                f"{delta_directory}: added {counts['people']} people, "
+                f"{counts['movies']} movies and {counts['stars']} stars, "
+                f"skipped {counts['dangling']} dangling stars."
+            )
+
+
+if __name__ == "__main__":
+    main()
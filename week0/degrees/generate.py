@@ -0,0 +1,124 @@
+"""
+Generate a synthetic degrees dataset with realistic structure.
+
+Writes people.csv, movies.csv and stars.csv in the format of the CS50
+dataset. Cast sizes follow a Pareto (power-law) distribution, and a few
+prolific people appear in many movies, so the co-star graph has the hubs,
+long tail and small components of the real thing. Rows are streamed to
+disk, so sizes from 10^4 up to 10^7 rows need little memory.
+
+Usage: python generate.py directory [--people N] [--movies N] [--seed S]
+"""
+
+import argparse
+import csv
+import os
+import random
+
+FIRST_NAMES = (
+    "James Mary John Patricia Robert Jennifer Michael Linda William Elizabeth "
+    "David Barbara Richard Susan Joseph Jessica Thomas Sarah Charles Karen "
+    "Christopher Nancy Daniel Lisa Matthew Betty Anthony Margaret Mark Sandra "
+    "Donald Ashley Steven Kimberly Paul Emily Andrew Donna Joshua Michelle "
+    "Kenneth Carol Kevin Amanda Brian Dorothy George Melissa Timothy Deborah "
+    "Ronald Stephanie Edward Rebecca Jason Sharon Jeffrey Laura Ryan Cynthia "
+    "Jacob Kathleen Gary Amy Nicholas Angela Eric Shirley Jonathan Anna "
+    "Stephen Brenda Larry Pamela Justin Emma Scott Nicole Brandon Helen "
+    "Benjamin Samantha Samuel Katherine Gregory Christine Alexander Debra "
+    "Frank Rachel Patrick Carolyn Raymond Janet Jack Catherine Dennis Maria"
+).split()
+
+LAST_NAMES = (
+    "Smith Johnson Williams Brown Jones Garcia Miller Davis Rodriguez Martinez "
+    "Hernandez Lopez Gonzalez Wilson Anderson Thomas Taylor Moore Jackson Martin "
+    "Lee Perez Thompson White Harris Sanchez Clark Ramirez Lewis Robinson "
+    "Walker Young Allen King Wright Scott Torres Nguyen Hill Flores Green "
+    "Adams Nelson Baker Hall Rivera Campbell Mitchell Carter Roberts Gomez "
+    "Phillips Evans Turner Diaz Parker Cruz Edwards Collins Reyes Stewart "
+    "Morris Morales Murphy Cook Rogers Gutierrez Ortiz Morgan Cooper Peterson "
+    "Bailey Reed Kelly Howard Ramos Kim Cox Ward Richardson Watson Brooks "
+    "Chavez Wood James Bennett Gray Mendoza Ruiz Hughes Price Alvarez Castillo "
+    "Sanders Patel Myers Long Ross Foster Jimenez Powell Jenkins Perry Russell"
+).split()
+
+TITLE_WORDS = (
+    "Night Day River Silent Last First Dark Golden Lost City Heart Storm "
+    "Shadow Summer Winter Road Home Fire Ice Dream Star Blood Secret Empire "
+    "Island Garden Moon Sun Ghost King Queen War Love Return Edge Kingdom"
+).split()
+
+# Pareto shape of cast sizes; smaller is heavier-tailed
+CAST_ALPHA = 1.3
+MAX_CAST = 500
+
+# Exponent skewing which people get cast; larger means more prolific hubs
+CASTING_SKEW = 1.5
+
+
+def generate(directory, num_people, num_movies=None, seed=0):
+    """
+    Write a synthetic dataset to `directory` and return the number
+    of star rows written.
+    """
+    if num_movies is None:
+        num_movies = max(1, num_people // 3)
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    # People, with some initials and missing birth years
+    with open(os.path.join(directory, "people.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(num_people):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            if rng.random() < 0.3:
+                name = f"{first} {chr(rng.randrange(65, 91))}. {last}"
+            else:
+                name = f"{first} {last}"
+            birth = "" if rng.random() < 0.1 else rng.randint(1900, 2010)
+            writer.writerow([person_id(i), name, birth])
+
+    # Movies
+    with open(os.path.join(directory, "movies.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(num_movies):
+            title = " ".join(rng.choice(TITLE_WORDS) for _ in range(rng.randint(1, 3)))
+            writer.writerow([movie_id(i), f"The {title}", rng.randint(1920, 2024)])
+
+    # Stars, with power-law cast sizes drawn from a skewed pool of people
+    stars = 0
+    with open(os.path.join(directory, "stars.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for i in range(num_movies):
+            size = min(MAX_CAST, int(rng.paretovariate(CAST_ALPHA)) + 1)
+            cast = {int(num_people * rng.random() ** CASTING_SKEW) for _ in range(size)}
+            for p in cast:
+                writer.writerow([person_id(p), movie_id(i)])
+            stars += len(cast)
+    return stars
+
+
+def person_id(i):
+    return i + 100
+
+
+def movie_id(i):
+    return i + 10000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory")
+    parser.add_argument("--people", type=int, default=10_000)
+    parser.add_argument("--movies", type=int, help="defaults to a third of --people")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stars = generate(args.directory, args.people, args.movies, args.seed)
+    print(f"Wrote {args.people} people and {stars} stars to {args.directory}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,521 @@
+import csv
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+
+
+class CompactGraph():
+    """
+    Integer-indexed storage for the degrees dataset.
+
+    People and movies are numbered densely in ascending IMDB id order and
+    the person <-> movie bipartite adjacency is kept as two CSR-style
+    offset + index arrays, so the whole graph costs a few bytes per star
+    instead of a dict and a set per person and movie.
+    """
+
+    # Attributes persisted by snapshots, as flat arrays and string lists
+    ARRAYS = (
+        "person_ids", "movie_ids", "person_births", "movie_years",
+        "name_order", "person_offsets", "person_movies",
+        "movie_offsets", "movie_people", "component", "component_sizes",
+    )
+    STRINGS = ("person_names", "movie_titles")
+
+    def __init__(self):
+
+        # Sorted IMDB ids; the position of an id is its dense index
+        self.person_ids = array("q")
+        self.movie_ids = array("q")
+
+        # Attributes stored column-wise, indexed by dense id (0 = unknown)
+        self.person_names = []
+        self.person_births = array("h")
+        self.movie_titles = []
+        self.movie_years = array("h")
+
+        # Person indices sorted by lowercase name, for name lookups
+        self.name_order = array("i")
+
+        # CSR adjacency: the movies of person p are
+        # person_movies[person_offsets[p]:person_offsets[p + 1]]
+        self.person_offsets = array("q", [0])
+        self.person_movies = array("i")
+        self.movie_offsets = array("q", [0])
+        self.movie_people = array("i")
+
+        # Connected component label of each person, and size of each component
+        self.component = array("i")
+        self.component_sizes = array("i")
+
+        # Star rows skipped while loading for referencing unknown ids
+        self.dangling_stars = 0
+
+        # Identifiers of the deltas merged in since the CSV files were read
+        self.deltas = []
+
+        # Fingerprint of those CSV files, once a snapshot has recorded it
+        self.sources = None
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Build a graph from the people, movies and stars CSV files.
+        """
+        graph = cls()
+
+        # Load people
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            rows = sorted(
+                (parse_id(row["id"]), row["name"], parse_year(row["birth"]))
+                for row in csv.DictReader(f)
+            )
+        for person_id, name, birth in rows:
+            graph.person_ids.append(person_id)
+            graph.person_names.append(name)
+            graph.person_births.append(birth)
+        del rows
+
+        # Load movies
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            rows = sorted(
+                (parse_id(row["id"]), row["title"], parse_year(row["year"]))
+                for row in csv.DictReader(f)
+            )
+        for movie_id, title, year in rows:
+            graph.movie_ids.append(movie_id)
+            graph.movie_titles.append(title)
+            graph.movie_years.append(year)
+        del rows
+
+        # Load stars, skipping rows that reference unknown ids
+        star_people = array("i")
+        star_movies = array("i")
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                p = graph.person_index(row["person_id"])
+                m = graph.movie_index(row["movie_id"])
+                if p is None or m is None:
+                    graph.dangling_stars += 1
+                    continue
+                star_people.append(p)
+                star_movies.append(m)
+
+        graph.build(star_people, star_movies)
+        return graph
+
+    def build(self, star_people, star_movies):
+        """
+        Build the name index, both CSR adjacency halves and the
+        component labels from parallel arrays of (person, movie) dense ids.
+        """
+        self.name_order = array("i", sorted(
+            range(len(self.person_ids)),
+            key=lambda p: self.person_names[p].lower()
+        ))
+        self.build_adjacency(star_people, star_movies)
+        self.component, self.component_sizes = connected_components(
+            self.num_people, (self.stars_of(m) for m in range(self.num_movies))
+        )
+
+    def build_adjacency(self, star_people, star_movies):
+        """
+        Build both CSR adjacency halves from parallel arrays of
+        (person, movie) dense ids.
+        """
+        self.person_offsets, self.person_movies = _csr(
+            self.num_people, star_people, star_movies
+        )
+        self.movie_offsets, self.movie_people = _csr(
+            self.num_movies, star_movies, star_people
+        )
+
+    @property
+    def num_people(self):
+        return len(self.person_ids)
+
+    @property
+    def num_movies(self):
+        return len(self.movie_ids)
+
+    def person_index(self, person_id):
+        """
+        Returns the dense index for an IMDB person id, or None.
+        """
+        return find_index(self.person_ids, person_id)
+
+    def movie_index(self, movie_id):
+        """
+        Returns the dense index for an IMDB movie id, or None.
+        """
+        return find_index(self.movie_ids, movie_id)
+
+    def person_id(self, p):
+        return str(self.person_ids[p])
+
+    def movie_id(self, m):
+        return str(self.movie_ids[m])
+
+    def movies_of(self, p):
+        """
+        Returns the dense movie indices person `p` starred in.
+        """
+        return self.person_movies[self.person_offsets[p]:self.person_offsets[p + 1]]
+
+    def stars_of(self, m):
+        """
+        Returns the dense person indices who starred in movie `m`.
+        """
+        return self.movie_people[self.movie_offsets[m]:self.movie_offsets[m + 1]]
+
+    def neighbors(self, p):
+        """
+        Yields (movie, person) dense index pairs for people
+        who starred with person `p`.
+        """
+        for m in self.movies_of(p):
+            for q in self.stars_of(m):
+                yield m, q
+
+    def neighbors_for_person(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person, as IMDB ids.
+        """
+        return {
+            (self.movie_id(m), self.person_id(q))
+            for m, q in self.neighbors(self.person_index(person_id))
+        }
+
+    def people_for_name(self, name):
+        """
+        Returns the dense indices of people with a given name,
+        ignoring case.
+        """
+        name = name.lower()
+        key = lambda p: self.person_names[p].lower()
+        lo = bisect_left(self.name_order, name, key=key)
+        hi = bisect_right(self.name_order, name, lo=lo, key=key)
+        return self.name_order[lo:hi]
+
+    def nbytes(self):
+        """
+        Returns the approximate size of the graph's arrays in bytes.
+        """
+        return sum(
+            getattr(self, name).itemsize * len(getattr(self, name))
+            for name in self.ARRAYS
+        )
+
+
+class DictGraph():
+    """
+    Gives the `people` and `movies` dicts of the default storage
+    the same adjacency interface as CompactGraph, keyed by IMDB id.
+    """
+
+    def __init__(self, people, movies):
+        self.people = people
+        self.movies = movies
+
+    def movies_of(self, person_id):
+        return self.people[person_id]["movies"]
+
+    def stars_of(self, movie_id):
+        return self.movies[movie_id]["stars"]
+
+    def neighbors(self, person_id):
+        for movie_id in self.movies_of(person_id):
+            for star_id in self.stars_of(movie_id):
+                yield movie_id, star_id
+
+
+class MovieFilter():
+    """
+    Restricts searches to movies whose year lies in [min_year, max_year],
+    either bound optional, and which satisfy `predicate(title, year)` if
+    given. Movies with an unknown year are excluded by any year bound.
+    Filters are compiled once per dataset into a mask over its movies.
+    """
+
+    def __init__(self, min_year=None, max_year=None, predicate=None):
+        self.min_year = min_year
+        self.max_year = max_year
+        self.predicate = predicate
+
+    def accepts(self, title, year):
+        if self.min_year is not None or self.max_year is not None:
+            if not year:
+                return False
+            if self.min_year is not None and year < self.min_year:
+                return False
+            if self.max_year is not None and year > self.max_year:
+                return False
+        return self.predicate is None or self.predicate(title, year)
+
+    def mask(self, graph):
+        """
+        Returns a bytearray over the dense movies of a CompactGraph,
+        1 for movies the filter keeps.
+        """
+        return bytearray(
+            self.accepts(graph.movie_titles[m], year)
+            for m, year in enumerate(graph.movie_years)
+        )
+
+    def allowed(self, movies):
+        """
+        Returns the set of ids in a `movies` dict the filter keeps.
+        """
+        return {
+            movie_id for movie_id, movie in movies.items()
+            if self.accepts(movie["title"], parse_year(movie["year"]))
+        }
+
+    def _key(self):
+        return (self.min_year, self.max_year, self.predicate)
+
+    def __eq__(self, other):
+        return isinstance(other, MovieFilter) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+
+class FilteredGraph():
+    """
+    Adjacency of a base graph (CompactGraph or DictGraph) restricted to
+    the movies in `allowed`, a compiled MovieFilter. The base graph is
+    shared, and excluded movies are dropped once per person expanded,
+    before any of their stars are scanned.
+    """
+
+    def __init__(self, graph, allowed):
+        self.graph = graph
+        self.allowed = allowed
+
+    def movies_of(self, person):
+        if isinstance(self.allowed, bytearray):
+            mask = self.allowed
+            return [m for m in self.graph.movies_of(person) if mask[m]]
+        return self.allowed.intersection(self.graph.movies_of(person))
+
+    def stars_of(self, movie):
+        return self.graph.stars_of(movie)
+
+    def neighbors(self, person):
+        for movie in self.movies_of(person):
+            for star in self.stars_of(movie):
+                yield movie, star
+
+
+class PeopleView(Mapping):
+    """
+    Read-only `people` dict lookalike backed by a CompactGraph.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        p = self.graph.person_index(person_id)
+        if p is None:
+            raise KeyError(person_id)
+        return {
+            "name": self.graph.person_names[p],
+            "birth": format_year(self.graph.person_births[p]),
+            "movies": {self.graph.movie_id(m) for m in self.graph.movies_of(p)},
+        }
+
+    def __contains__(self, person_id):
+        return self.graph.person_index(person_id) is not None
+
+    def __iter__(self):
+        return (str(person_id) for person_id in self.graph.person_ids)
+
+    def __len__(self):
+        return self.graph.num_people
+
+
+class MoviesView(Mapping):
+    """
+    Read-only `movies` dict lookalike backed by a CompactGraph.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        m = self.graph.movie_index(movie_id)
+        if m is None:
+            raise KeyError(movie_id)
+        return {
+            "title": self.graph.movie_titles[m],
+            "year": format_year(self.graph.movie_years[m]),
+            "stars": {self.graph.person_id(p) for p in self.graph.stars_of(m)},
+        }
+
+    def __contains__(self, movie_id):
+        return self.graph.movie_index(movie_id) is not None
+
+    def __iter__(self):
+        return (str(movie_id) for movie_id in self.graph.movie_ids)
+
+    def __len__(self):
+        return self.graph.num_movies
+
+
+class NamesView(Mapping):
+    """
+    Read-only `names` dict lookalike backed by a CompactGraph.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        matches = self.graph.people_for_name(name)
+        if len(matches) == 0:
+            raise KeyError(name)
+        return {self.graph.person_id(p) for p in matches}
+
+    def __contains__(self, name):
+        return len(self.graph.people_for_name(name)) > 0
+
+    def __iter__(self):
+        previous = None
+        for p in self.graph.name_order:
+            name = self.graph.person_names[p].lower()
+            if name != previous:
+                yield name
+                previous = name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def connected_components(size, casts):
+    """
+    Label `size` people by connected component using union-find, where
+    `casts` yields the dense people of each movie. Returns (labels, sizes)
+    arrays, with components numbered in order of their first person.
+    """
+    parent = array("i", range(size))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for cast in casts:
+        root = None
+        for p in cast:
+            r = find(p)
+            if root is None:
+                root = r
+            elif r != root:
+                parent[r] = root
+
+    labels = array("i", [-1]) * size
+    sizes = array("i")
+    for p in range(size):
+        r = find(p)
+        if labels[r] == -1:
+            labels[r] = len(sizes)
+            sizes.append(0)
+        labels[p] = labels[r]
+        sizes[labels[p]] += 1
+    return labels, sizes
+
+
+def join_components(sizes, groups):
+    """
+    Merge connected components without relabelling any people, where
+    `sizes` gives the size of each component by label and `groups` yields
+    lists of labels that new stars have connected. Returns (relabel, sizes)
+    arrays mapping each old label to its new one, or (None, sizes) if no
+    components were merged. Surviving labels keep their relative order.
+    """
+    parent = {}
+
+    def find(x):
+        while parent.get(x, x) != x:
+            parent[x] = parent.get(parent[x], parent[x])
+            x = parent[x]
+        return x
+
+    for group in groups:
+        root = None
+        for label in group:
+            r = find(label)
+            if root is None:
+                root = r
+            elif r != root:
+                parent[r] = root
+    merged = sorted(label for label in parent if find(label) != label)
+    if not merged:
+        return None, sizes
+
+    # Surviving labels shift down past the merged ones before them
+    relabel = array("i")
+    new_sizes = array("i")
+    start = 0
+    for shift, label in enumerate(merged + [len(sizes)]):
+        relabel.extend(array("i", range(start - shift, label - shift)))
+        new_sizes.extend(sizes[start:label])
+        relabel.append(-1)
+        start = label + 1
+    del relabel[len(sizes):]
+    for label in merged:
+        root = relabel[find(label)]
+        relabel[label] = root
+        new_sizes[root] += sizes[label]
+    return relabel, new_sizes
+
+
+def _csr(size, sources, targets):
+    """
+    Counting-sort parallel (source, target) arrays into CSR offsets and indices.
+    """
+    offsets = array("q", bytes(8 * (size + 1)))
+    for s in sources:
+        offsets[s + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    indices = array("i", bytes(4 * len(targets)))
+    cursor = array("q", offsets[:-1])
+    for s, t in zip(sources, targets):
+        indices[cursor[s]] = t
+        cursor[s] += 1
+    return offsets, indices
+
+
+def find_index(ids, key):
+    try:
+        key = int(key)
+    except (TypeError, ValueError):
+        return None
+    i = bisect_left(ids, key)
+    if i < len(ids) and ids[i] == key:
+        return i
+    return None
+
+
+def parse_id(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"compact storage requires numeric ids, got {value!r}")
+
+
+def parse_year(value):
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+
+def format_year(value):
+    return str(value) if value else ""
@@ -0,0 +1,171 @@
+"""
+Parallel, chunked CSV ingestion into a CompactGraph.
+
+Each CSV file is split into byte ranges that start and end on line
+boundaries, and the ranges are parsed on a process pool. Workers stream
+rows with csv.reader and return compact arrays rather than row dicts,
+so memory stays bounded by the finished arrays. The partial results are
+then merged into one graph.
+
+Fields containing embedded newlines are not supported, since a chunk
+boundary could fall inside one; the degrees dataset has none.
+"""
+
+import csv
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from graph import CompactGraph, find_index, parse_id, parse_year
+
+# Target size of each byte range handed to a worker
+CHUNK_BYTES = 16 * 1024 * 1024
+
+# Dense id tables, set in each stars worker by _init_stars
+_person_ids = None
+_movie_ids = None
+
+
+def load_parallel(directory, workers=None, chunk_bytes=CHUNK_BYTES):
+    """
+    Build a CompactGraph from the CSV files in `directory` using a pool
+    of `workers` processes. Star rows that reference unknown people or
+    movies are counted in the graph's `dangling_stars` attribute.
+    """
+    graph = CompactGraph()
+
+    # Parse people and movies in parallel
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        people = _map_chunks(pool, _parse_entities, f"{directory}/people.csv",
+                             ("id", "name", "birth"), chunk_bytes)
+        movies = _map_chunks(pool, _parse_entities, f"{directory}/movies.csv",
+                             ("id", "title", "year"), chunk_bytes)
+        people, movies = list(people), list(movies)
+
+    graph.person_ids, graph.person_names, graph.person_births = _merge_entities(people)
+    graph.movie_ids, graph.movie_titles, graph.movie_years = _merge_entities(movies)
+    del people, movies
+
+    # Parse stars, mapping ids to dense indices inside the workers
+    star_people = array("i")
+    star_movies = array("i")
+    graph.dangling_stars = 0
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_stars,
+        initargs=(graph.person_ids, graph.movie_ids),
+    ) as pool:
+        for chunk_people, chunk_movies, dangling in _map_chunks(
+            pool, _parse_stars, f"{directory}/stars.csv",
+            ("person_id", "movie_id"), chunk_bytes
+        ):
+            star_people.extend(chunk_people)
+            star_movies.extend(chunk_movies)
+            graph.dangling_stars += dangling
+
+    graph.build(star_people, star_movies)
+    return graph
+
+
+def chunk_ranges(path, chunk_bytes=CHUNK_BYTES):
+    """
+    Returns the CSV header and (start, end) byte ranges covering the rest
+    of the file, each starting at the beginning of a line.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline()
+        boundaries = [f.tell()]
+        while boundaries[-1] < size:
+            f.seek(min(boundaries[-1] + chunk_bytes, size))
+            f.readline()
+            boundaries.append(min(f.tell(), size))
+    header = next(csv.reader([header.decode("utf-8")]))
+    return header, list(zip(boundaries, boundaries[1:]))
+
+
+def _map_chunks(pool, parse, path, columns, chunk_bytes):
+    header, ranges = chunk_ranges(path, chunk_bytes)
+    indices = tuple(header.index(column) for column in columns)
+    return pool.map(parse, [(path, start, end, indices) for start, end in ranges])
+
+
+def _rows(path, start, end, indices):
+    """
+    Yields the selected columns of each CSV row in the byte range.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        lines = (line.decode("utf-8") for line in _lines(f, end))
+        for row in csv.reader(lines):
+            if row:
+                yield tuple(row[i] for i in indices)
+
+
+def _lines(f, end):
+    position = f.tell()
+    while position < end:
+        line = f.readline()
+        if not line:
+            return
+        position += len(line)
+        yield line
+
+
+def _parse_entities(task):
+    """
+    Parse an (id, label, year) byte range into compact arrays.
+    """
+    ids = array("q")
+    labels = []
+    years = array("h")
+    for entity_id, label, year in _rows(*task):
+        ids.append(parse_id(entity_id))
+        labels.append(label)
+        years.append(parse_year(year))
+    return ids, labels, years
+
+
+def _merge_entities(chunks):
+    """
+    Concatenate parsed entity chunks and sort them by id.
+    """
+    ids = array("q")
+    labels = []
+    years = array("h")
+    for chunk_ids, chunk_labels, chunk_years in chunks:
+        ids.extend(chunk_ids)
+        labels.extend(chunk_labels)
+        years.extend(chunk_years)
+
+    order = sorted(range(len(ids)), key=ids.__getitem__)
+    return (
+        array("q", (ids[i] for i in order)),
+        [labels[i] for i in order],
+        array("h", (years[i] for i in order)),
+    )
+
+
+def _init_stars(person_ids, movie_ids):
+    global _person_ids, _movie_ids
+    _person_ids, _movie_ids = person_ids, movie_ids
+
+
+def _parse_stars(task):
+    """
+    Parse a (person_id, movie_id) byte range into dense index arrays,
+    counting rows that reference unknown people or movies.
+    """
+    star_people = array("i")
+    star_movies = array("i")
+    dangling = 0
+    for person_id, movie_id in _rows(*task):
+        p = find_index(_person_ids, person_id)
+        m = find_index(_movie_ids, movie_id)
+        if p is None or m is None:
+            dangling += 1
+            continue
+        star_people.append(p)
+        star_movies.append(m)
+    return star_people, star_movies, dangling
+
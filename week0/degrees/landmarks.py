@@ -0,0 +1,222 @@
+"""
+Landmark distance oracle for the degrees graph.
+
+Breadth-first distances from k high-degree landmark people are stored as
+one uint8 array per landmark. By the triangle inequality, for any people
+p and q and landmark L,
+
+    |d(L, p) - d(L, q)| <= d(p, q) <= d(L, p) + d(L, q)
+
+so bounds on separation cost O(k) lookups, and the lower bound is an
+admissible, consistent A* heuristic (the ALT algorithm).
+
+Usage: python landmarks.py [directory] [-k K]
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+from array import array
+
+from graph import CompactGraph
+from snapshot import fingerprint, sources_match
+
+# Distance stored for people a landmark cannot reach
+UNREACHABLE = 255
+
+FILENAME = "degrees.landmarks"
+
+
+class LandmarkIndex():
+
+    def __init__(self, landmarks, distances):
+        self.landmarks = landmarks
+        self.distances = distances
+
+    @classmethod
+    def build(cls, graph, k=16):
+        """
+        Pick the `k` people with the most co-star edges as landmarks
+        and record every person's distance from each of them.
+        """
+        degree = [
+            sum(len(graph.stars_of(m)) for m in graph.movies_of(p))
+            for p in range(graph.num_people)
+        ]
+        landmarks = array("i", sorted(
+            range(graph.num_people), key=degree.__getitem__, reverse=True
+        )[:k])
+        distances = [distances_from(graph, landmark) for landmark in landmarks]
+        return cls(landmarks, distances)
+
+    def bounds(self, p, q):
+        """
+        Returns (lower, upper) bounds on the separation of dense people
+        `p` and `q`. Both are math.inf if they are provably disconnected;
+        upper is math.inf if no landmark reaches both.
+        """
+        if p == q:
+            return 0, 0
+        lower, upper = 0, math.inf
+        for distances in self.distances:
+            dp, dq = distances[p], distances[q]
+            if dp == UNREACHABLE and dq == UNREACHABLE:
+                continue
+            if dp == UNREACHABLE or dq == UNREACHABLE:
+                return math.inf, math.inf
+            lower = max(lower, abs(dp - dq))
+            upper = min(upper, dp + dq)
+        return lower, upper
+
+    def heuristic(self, target):
+        """
+        Returns h(p), a lower bound on the separation of `p` from `target`.
+        """
+        pairs = [(distances, distances[target]) for distances in self.distances]
+
+        def h(p):
+            best = 0
+            for distances, dt in pairs:
+                dp = distances[p]
+                if dp == UNREACHABLE or dt == UNREACHABLE:
+                    if dp != dt:
+                        return math.inf
+                    continue
+                if dp - dt > best:
+                    best = dp - dt
+                elif dt - dp > best:
+                    best = dt - dp
+            return best
+
+        return h
+
+    def update(self, graph, people_map, movies):
+        """
+        Bring the distances up to date after a delta (see delta.py) added
+        people and stars to `graph`. `people_map` renumbers the old dense
+        people and `movies` are the dense movies that gained stars. New
+        stars only shorten distances, so each landmark's distances are
+        relaxed outward from those movies instead of recomputed.
+        """
+        inserted = people_map.inserted()
+        self.landmarks = array("i", (people_map[p] for p in self.landmarks))
+        self.distances = [
+            people_map.splice(distances, [UNREACHABLE] * len(inserted))
+            for distances in self.distances
+        ]
+        for distances in self.distances:
+            heap = []
+            for m in movies:
+                stars = graph.stars_of(m)
+                depth = min(distances[q] for q in stars) + 1
+                if depth >= UNREACHABLE:
+                    continue
+                for q in stars:
+                    if distances[q] > depth:
+                        distances[q] = depth
+                        heapq.heappush(heap, (depth, q))
+            while heap:
+                depth, p = heapq.heappop(heap)
+                if distances[p] != depth or depth + 1 >= UNREACHABLE:
+                    continue
+                for m in graph.movies_of(p):
+                    for q in graph.stars_of(m):
+                        if distances[q] > depth + 1:
+                            distances[q] = depth + 1
+                            heapq.heappush(heap, (depth + 1, q))
+
+    def save(self, path, graph, directory):
+        """
+        Write the index for `graph`, loaded from the CSV files in
+        `directory`, to `path`. The header records their fingerprint
+        and the deltas merged into the graph.
+        """
+        header = json.dumps({
+            "k": len(self.landmarks),
+            "num_people": graph.num_people,
+            "num_stars": len(graph.person_movies),
+            "sources": graph.sources or fingerprint(directory, hashes=True),
+            "deltas": list(graph.deltas),
+        })
+        with open(path, "wb") as f:
+            f.write(header.encode("utf-8") + b"\n")
+            self.landmarks.tofile(f)
+            for distances in self.distances:
+                distances.tofile(f)
+
+    @classmethod
+    def load(cls, path, graph, directory, verify=False):
+        """
+        Read an index saved by `save`, or return None if it is stale:
+        built for a graph with different deltas or a different number
+        of people or stars, or from CSV files in `directory` that have
+        changed since. With `verify`, the files are also re-hashed.
+        """
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            if (header["num_people"], header.get("num_stars")) != \
+                    (graph.num_people, len(graph.person_movies)):
+                return None
+            if header.get("deltas") != list(graph.deltas):
+                return None
+            if "sources" not in header or \
+                    not sources_match(header["sources"], directory, verify):
+                return None
+            landmarks = array("i")
+            landmarks.fromfile(f, header["k"])
+            distances = []
+            for _ in range(header["k"]):
+                column = array("B")
+                column.fromfile(f, graph.num_people)
+                distances.append(column)
+        return cls(landmarks, distances)
+
+
+def distances_from(graph, source):
+    """
+    Returns a uint8 array of every person's separation from `source`,
+    capped at UNREACHABLE.
+    """
+    distances = array("B", bytes([UNREACHABLE])) * graph.num_people
+    visited_movies = bytearray(graph.num_movies)
+    distances[source] = 0
+    layer = [source]
+    depth = 0
+    while layer and depth < UNREACHABLE - 1:
+        depth += 1
+        next_layer = []
+        for p in layer:
+            for m in graph.movies_of(p):
+                if visited_movies[m]:
+                    continue
+                visited_movies[m] = 1
+                for q in graph.stars_of(m):
+                    if distances[q] == UNREACHABLE:
+                        distances[q] = depth
+                        next_layer.append(q)
+        layer = next_layer
+    return distances
+
+
+def landmarks_path(directory):
+    return os.path.join(directory, FILENAME)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("-k", type=int, default=16, help="number of landmarks")
+    args = parser.parse_args()
+
+    print("Loading data...")
+    graph = CompactGraph.from_csv(args.directory)
+    print(f"Computing distances from {args.k} landmarks...")
+    index = LandmarkIndex.build(graph, args.k)
+    index.save(landmarks_path(args.directory), graph, args.directory)
+    print(f"Landmarks written to {landmarks_path(args.directory)}.")
+
+
+if __name__ == "__main__":
+    main()
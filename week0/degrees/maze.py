@@ -1,10 +1,33 @@
-import sys
+import argparse
+import heapq
+import os
+import time
+from array import array
+
+from util import DequeQueueFrontier, DequeStackFrontier, PriorityFrontier
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Categories of a drawn cell, and their colors
+EMPTY_CELL, WALL_CELL, START_CELL, GOAL_CELL, SOLUTION_CELL, EXPLORED_CELL = range(6)
+COLORS = (
+    (237, 240, 252),
+    (40, 40, 40),
+    (255, 0, 0),
+    (0, 171, 28),
+    (220, 235, 113),
+    (212, 97, 85),
+)
 
 class Node():
-    def __init__(self, state, parent, action):
+    def __init__(self, state, parent, action, cost=0):
         self.state = state
         self.parent = parent
         self.action = action
+        self.cost = cost
 
 
 class StackFrontier():
@@ -116,15 +139,21 @@ class Maze():
         return result
 
 
-    def solve(self):
-        """Finds a solution to maze, if one exists."""
+    def solve(self, frontier=None):
+        """
+        Finds a solution to maze, if one exists.
+
+        `frontier` may be any empty frontier (stack, queue or priority);
+        it defaults to a stack, giving depth-first search.
+        """
 
         # Keep track of number of states explored
         self.num_explored = 0
 
         # Initialize frontier to just the starting position
         start = Node(state=self.start, parent=None, action=None)
-        frontier = StackFrontier()
+        if frontier is None:
+            frontier = DequeStackFrontier()
         frontier.add(start)
 
         # Initialize an empty explored set
@@ -143,15 +172,7 @@ class Maze():
 
             # If node is the goal, then we have a solution
             if node.state == self.goal:
-                actions = []
-                cells = []
-                while node.parent is not None:
-                    actions.append(node.action)
-                    cells.append(node.state)
-                    node = node.parent
-                actions.reverse()
-                cells.reverse()
-                self.solution = (actions, cells)
+                self.solution = self.backtrack(node)
                 return
 
             # Mark node as explored
@@ -164,46 +185,166 @@ class Maze():
                     frontier.add(child)
 
 
-    def output_image(self, filename, show_solution=True, show_explored=False):
+    def solve_best_first(self, priority):
+        """
+        Finds a solution to maze, if one exists, by always expanding the
+        frontier node with the lowest `priority(node)`, where `node.cost`
+        is the number of steps from the start.
+
+        A cell already on the frontier is added again when a cheaper path
+        to it is found, and the dearer copy is skipped when it comes off
+        the heap, so uniform-cost and A* search return shortest paths.
+        """
+        self.num_explored = 0
+
+        start = Node(state=self.start, parent=None, action=None)
+        frontier = PriorityFrontier(priority)
+        frontier.add(start)
+
+        # Cheapest known cost of reaching each cell
+        costs = {self.start: 0}
+        self.explored = set()
+
+        while True:
+            if frontier.empty():
+                raise Exception("no solution")
+
+            node = frontier.remove()
+            if node.state in self.explored or node.cost > costs[node.state]:
+                continue
+            self.num_explored += 1
+
+            if node.state == self.goal:
+                self.solution = self.backtrack(node)
+                return
+
+            self.explored.add(node.state)
+
+            for action, state in self.neighbors(node.state):
+                cost = node.cost + 1
+                if state not in self.explored and cost < costs.get(state, cost + 1):
+                    costs[state] = cost
+                    frontier.add(Node(state=state, parent=node, action=action, cost=cost))
+
+
+    def manhattan(self, state):
+        """
+        Returns the Manhattan distance from `state` to the goal, a lower
+        bound on the steps left since the maze only allows four moves.
+        """
+        return abs(state[0] - self.goal[0]) + abs(state[1] - self.goal[1])
+
+
+    def backtrack(self, node):
+        """
+        Returns the (actions, cells) that lead from the start to `node`.
+        """
+        actions = []
+        cells = []
+        while node.parent is not None:
+            actions.append(node.action)
+            cells.append(node.state)
+            node = node.parent
+        actions.reverse()
+        cells.reverse()
+        return actions, cells
+
+
+    def output_image(self, filename, show_solution=True, show_explored=False,
+                     cell_size=50, cell_border=2, tile_cells=None):
+        """
+        Draws the maze as a PNG with `cell_size` pixel cells, each inset
+        by `cell_border` pixels of black.
+
+        With NumPy, the image is rendered as an array (see render). If
+        `tile_cells` is given, the maze is instead written as PNG tiles of
+        up to tile_cells x tile_cells cells, one at a time, named after
+        `filename` with the tile's row and column appended (maze-0-1.png),
+        so mazes too big for one image can still be drawn.
+        """
+        from PIL import Image
+
+        if np is None:
+            if tile_cells is not None:
+                raise ImportError("tiled output requires NumPy")
+            return self.draw_cells(filename, show_solution, show_explored, cell_size, cell_border)
+
+        categories = self.categories(show_solution, show_explored)
+        if tile_cells is None:
+            Image.fromarray(render(categories, cell_size, cell_border)).save(filename)
+            return
+
+        root, extension = os.path.splitext(filename)
+        for i in range(0, self.height, tile_cells):
+            for j in range(0, self.width, tile_cells):
+                tile = categories[i:i + tile_cells, j:j + tile_cells]
+                Image.fromarray(render(tile, cell_size, cell_border)).save(
+                    f"{root}-{i // tile_cells}-{j // tile_cells}{extension}"
+                )
+
+
+    def categories(self, show_solution=True, show_explored=False):
+        """
+        Returns a NumPy array of the category of each cell (EMPTY_CELL,
+        WALL_CELL, ...), the solution and explored cells included only
+        once the maze is solved.
+        """
+        categories = np.full((self.height, self.width), EMPTY_CELL, dtype=np.uint8)
+        if self.solution is not None:
+            if show_explored and self.explored:
+                cells = np.array(list(self.explored))
+                categories[cells[:, 0], cells[:, 1]] = EXPLORED_CELL
+            if show_solution and self.solution[1]:
+                cells = np.array(self.solution[1])
+                categories[cells[:, 0], cells[:, 1]] = SOLUTION_CELL
+        categories[self.goal] = GOAL_CELL
+        categories[self.start] = START_CELL
+        categories[np.array(self.walls, dtype=bool)] = WALL_CELL
+        return categories
+
+
+    def draw_cells(self, filename, show_solution, show_explored, cell_size, cell_border):
+        """
+        Draws the maze one PIL rectangle per cell, for when NumPy is not
+        installed.
+        """
         from PIL import Image, ImageDraw
-        cell_size = 50
-        cell_border = 2
 
         # Create a blank canvas
         img = Image.new(
-            "RGBA",
+            "RGB",
             (self.width * cell_size, self.height * cell_size),
             "black"
         )
         draw = ImageDraw.Draw(img)
 
-        solution = self.solution[1] if self.solution is not None else None
+        solution = set(self.solution[1]) if self.solution is not None else None
         for i, row in enumerate(self.walls):
             for j, col in enumerate(row):
 
                 # Walls
                 if col:
-                    fill = (40, 40, 40)
+                    fill = COLORS[WALL_CELL]
 
                 # Start
                 elif (i, j) == self.start:
-                    fill = (255, 0, 0)
+                    fill = COLORS[START_CELL]
 
                 # Goal
                 elif (i, j) == self.goal:
-                    fill = (0, 171, 28)
+                    fill = COLORS[GOAL_CELL]
 
                 # Solution
                 elif solution is not None and show_solution and (i, j) in solution:
-                    fill = (220, 235, 113)
+                    fill = COLORS[SOLUTION_CELL]
 
                 # Explored
                 elif solution is not None and show_explored and (i, j) in self.explored:
-                    fill = (212, 97, 85)
+                    fill = COLORS[EXPLORED_CELL]
 
                 # Empty cell
                 else:
-                    fill = (237, 240, 252)
+                    fill = COLORS[EMPTY_CELL]
 
                 # Draw cell
                 draw.rectangle(
@@ -215,15 +356,347 @@ class Maze():
         img.save(filename)
 
 
-if len(sys.argv) != 2:
-    sys.exit("Usage: python maze.py maze.txt")
+class GridMaze(Maze):
+    """
+    Maze for very large grids. Walls are a NumPy bool array, and cells
+    are flat indices into a copy of the grid padded with a wall border,
+    so the four moves are fixed index offsets that never leave it.
+    Solvers keep no per-cell objects: `explored` is a bytearray over the
+    padded grid that is zero for unexplored cells and otherwise records
+    the move that reached the cell (1 + its index in MOVES), which is
+    all backtracking needs.
+    """
+
+    MOVES = ("up", "down", "left", "right")
+
+    # `explored` value of the start cell
+    START = len(MOVES) + 1
+
+    # Narrower breadth-first layers are expanded without NumPy
+    SMALL_LAYER = 64
+
+    def __init__(self, filename):
+        if np is None:
+            raise ImportError("GridMaze requires NumPy")
+
+        # Find the size in a first pass, so lines need not be kept
+        self.height = 0
+        self.width = 0
+        starts = goals = 0
+        with open(filename) as f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                self.height += 1
+                self.width = max(self.width, len(line))
+                starts += line.count("A")
+                goals += line.count("B")
+        if starts != 1:
+            raise Exception("maze must have exactly one start point")
+        if goals != 1:
+            raise Exception("maze must have exactly one goal")
+
+        # 1 for each open cell of the padded grid
+        self.stride = self.width + 2
+        self.open = bytearray((self.height + 2) * self.stride)
+        grid = self.grid()
+        with open(filename) as f:
+            for i, line in enumerate(f, 1):
+                codes = np.frombuffer(line.rstrip("\r\n").encode("utf-32-le"), dtype=np.uint32)
+                grid[i, 1:len(codes) + 1] = np.isin(codes, (ord(" "), ord("A"), ord("B")))
+                grid[i, len(codes) + 1:-1] = 1
+                for char, name in (("A", "start"), ("B", "goal")):
+                    j = np.flatnonzero(codes == ord(char))
+                    if len(j):
+                        setattr(self, name, (i - 1, int(j[0])))
+        self.walls = grid[1:-1, 1:-1] == 0
+
+        self.offsets = (-self.stride, self.stride, -1, 1)
+        self.solution = None
+
+    def grid(self):
+        """
+        Returns the padded open-cell grid as a 2-D NumPy view of `open`.
+        """
+        return np.frombuffer(self.open, dtype=np.uint8).reshape(self.height + 2, self.stride)
+
+    def index(self, cell):
+        return (cell[0] + 1) * self.stride + cell[1] + 1
+
+    def cell(self, index):
+        row, col = divmod(index, self.stride)
+        return row - 1, col - 1
+
+    def neighbors(self, state):
+        """
+        Returns the (action, index) moves from flat index `state`.
+        """
+        return [
+            (action, state + offset)
+            for action, offset in zip(self.MOVES, self.offsets)
+            if self.open[state + offset]
+        ]
+
+    def solve_depth_first(self):
+        """
+        Depth-first search with an integer stack; each entry packs a
+        cell's index with the move that reached it.
+        """
+        self.num_explored = 0
+        self.explored = explored = bytearray(len(self.open))
+        is_open, offsets, goal = self.open, self.offsets, self.index(self.goal)
+        stack = array("q", [self.index(self.start) * 8 + self.START])
+
+        while stack:
+            entry = stack.pop()
+            state = entry >> 3
+            if explored[state]:
+                continue
+            explored[state] = entry & 7
+            self.num_explored += 1
+            if state == goal:
+                self.solution = self.backtrack(goal)
+                return
+
+            for move, offset in enumerate(offsets, 1):
+                neighbor = state + offset
+                if is_open[neighbor] and not explored[neighbor]:
+                    stack.append(neighbor * 8 + move)
+
+        raise Exception("no solution")
+
+    def solve_breadth_first(self):
+        """
+        Breadth-first search a whole layer at a time. Wide layers are
+        expanded with NumPy array operations, finding, filtering and
+        marking each move's neighbors of the frontier at once; layers
+        narrower than SMALL_LAYER, as in long corridors, are expanded
+        cell by cell, where per-call NumPy overhead would dominate.
+        """
+        self.num_explored = 0
+        self.explored = explored = bytearray(len(self.open))
+        explored_array = np.frombuffer(self.explored, dtype=np.uint8)
+        is_open, open_array = self.open, np.frombuffer(self.open, dtype=np.uint8)
+        offsets, goal = self.offsets, self.index(self.goal)
+
+        start = self.index(self.start)
+        frontier = [start]
+        explored[start] = self.START
+        while not explored[goal]:
+            if not len(frontier):
+                raise Exception("no solution")
+            self.num_explored += len(frontier)
+
+            if len(frontier) < self.SMALL_LAYER:
+                layer = []
+                for state in frontier:
+                    for move, offset in enumerate(offsets, 1):
+                        neighbor = state + offset
+                        if is_open[neighbor] and not explored[neighbor]:
+                            explored[neighbor] = move
+                            layer.append(neighbor)
+                frontier = layer
+                continue
+
+            frontier = np.asarray(frontier, dtype=np.int64)
+            layer = []
+            for move, offset in enumerate(offsets, 1):
+                reached = frontier + offset
+                reached = reached[(open_array[reached] != 0) & (explored_array[reached] == 0)]
+                explored_array[reached] = move
+                layer.append(reached)
+            frontier = np.concatenate(layer)
+
+        # The goal itself is explored like any other cell of its layer
+        self.num_explored += 1
+        self.solution = self.backtrack(goal)
+
+    def solve_weighted(self, cost_weight, heuristic_weight):
+        """
+        Best-first search by cost_weight * steps + heuristic_weight *
+        Manhattan distance: uniform-cost is (1, 0), greedy (0, 1) and A*
+        (1, 1). Cells may be pushed more than once; a cell is explored,
+        and its move recorded, when it first comes off the heap, which
+        for uniform-cost and A* is by a shortest path, since the
+        Manhattan distance is consistent. Ties favour cells nearer the
+        goal.
+
+        Every move costs one step, so uniform-cost search explores cells
+        in breadth-first order and is run as solve_breadth_first.
+        """
+        if heuristic_weight == 0:
+            return self.solve_breadth_first()
+
+        self.num_explored = 0
+        self.explored = explored = bytearray(len(self.open))
+        is_open, offsets, stride = self.open, self.offsets, self.stride
+        goal_row, goal_col = self.goal[0] + 1, self.goal[1] + 1
+        goal = self.index(self.goal)
+
+        # Entries are (priority, distance to goal, steps, index * 8 + move)
+        start = self.index(self.start)
+        h = self.manhattan(self.start)
+        heap = [(heuristic_weight * h, h, 0, start * 8 + self.START)]
+
+        while heap:
+            _, _, cost, entry = heapq.heappop(heap)
+            state = entry >> 3
+            if explored[state]:
+                continue
+            explored[state] = entry & 7
+            self.num_explored += 1
+            if state == goal:
+                self.solution = self.backtrack(goal)
+                return
+
+            cost += 1
+            for move, offset in enumerate(offsets, 1):
+                neighbor = state + offset
+                if is_open[neighbor] and not explored[neighbor]:
+                    row, col = divmod(neighbor, stride)
+                    h = abs(row - goal_row) + abs(col - goal_col)
+                    heapq.heappush(heap, (
+                        cost_weight * cost + heuristic_weight * h, h, cost, neighbor * 8 + move
+                    ))
+
+        raise Exception("no solution")
+
+    def backtrack(self, index):
+        """
+        Returns the (actions, cells) that lead from the start to the
+        cell at flat `index`, following the moves in `explored`. Cells
+        are an n x 2 array of (row, col), which for very long paths is
+        far smaller than a list of tuples.
+        """
+        explored, offsets, moves = self.explored, self.offsets, self.MOVES
+        actions = []
+        indices = array("q")
+        while explored[index] != self.START:
+            move = explored[index] - 1
+            actions.append(moves[move])
+            indices.append(index)
+            index -= offsets[move]
+        actions.reverse()
+        indices.reverse()
+        indices = np.frombuffer(indices, dtype=np.int64)
+        cells = np.empty((len(indices), 2), dtype=np.int32)
+        cells[:, 0] = indices // self.stride - 1
+        cells[:, 1] = indices % self.stride - 1
+        return actions, cells
+
+    def explored_cells(self):
+        """
+        Returns a bool array of the explored cells, shaped like `walls`.
+        """
+        explored = np.frombuffer(self.explored, dtype=np.uint8)
+        return explored.reshape(self.height + 2, self.stride)[1:-1, 1:-1] != 0
+
+    def print(self):
+        chars = np.where(self.walls, "█", " ")
+        if self.solution is not None:
+            cells = self.solution[1]
+            chars[cells[:, 0], cells[:, 1]] = "*"
+        chars[self.start] = "A"
+        chars[self.goal] = "B"
+        print()
+        for row in chars:
+            print("".join(row))
+        print()
+
+    def categories(self, show_solution=True, show_explored=False):
+        # Fill in place, as np.where would build an int64 array first
+        categories = np.full(self.walls.shape, EMPTY_CELL, dtype=np.uint8)
+        categories[self.walls] = WALL_CELL
+        if self.solution is not None:
+            if show_explored:
+                categories[self.explored_cells()] = EXPLORED_CELL
+            if show_solution:
+                cells = self.solution[1]
+                categories[cells[:, 0], cells[:, 1]] = SOLUTION_CELL
+        categories[self.goal] = GOAL_CELL
+        categories[self.start] = START_CELL
+        return categories
+
+
+def render(categories, cell_size=50, cell_border=2):
+    """
+    Returns an RGB image array of the cells in `categories`, with one
+    color lookup per cell. Each row of cells is scaled up to one row of
+    pixels by a kernel that is 1 inside a cell and 0 on its black
+    border, and that row is then copied to every pixel row inside the
+    cells, matching the rectangles the PIL renderer draws.
+    """
+    inside = slice(cell_border, cell_size - cell_border + 1)
+    kernel = np.zeros(cell_size, dtype=np.uint8)
+    kernel[inside] = 1
+
+    colors = np.array(COLORS, dtype=np.uint8)[categories]
+    height, width = categories.shape
+    rows = (colors[:, :, None, :] * kernel[None, None, :, None]).reshape(height, 1, -1, 3)
+    pixels = np.zeros((height, cell_size, width * cell_size, 3), dtype=np.uint8)
+    pixels[:, inside] = rows
+    return pixels.reshape(height * cell_size, width * cell_size, 3)
+
+
+# Solvers selectable by name from the command line
+SOLVERS = {
+    "dfs": lambda maze: maze.solve(DequeStackFrontier()),
+    "bfs": lambda maze: maze.solve(DequeQueueFrontier()),
+    "ucs": lambda maze: maze.solve_best_first(lambda node: node.cost),
+    "greedy": lambda maze: maze.solve_best_first(lambda node: maze.manhattan(node.state)),
+    "astar": lambda maze: maze.solve_best_first(
+        lambda node: node.cost + maze.manhattan(node.state)
+    ),
+}
+
+# The same solvers for a GridMaze
+GRID_SOLVERS = {
+    "dfs": lambda maze: maze.solve_depth_first(),
+    "bfs": lambda maze: maze.solve_breadth_first(),
+    "ucs": lambda maze: maze.solve_weighted(1, 0),
+    "greedy": lambda maze: maze.solve_weighted(0, 1),
+    "astar": lambda maze: maze.solve_weighted(1, 1),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(usage="python maze.py maze.txt")
+    parser.add_argument("maze")
+    parser.add_argument("--solver", choices=SOLVERS, default="dfs")
+    parser.add_argument("--output", default="maze.png", help="image to draw the solution in")
+    parser.add_argument(
+        "--grid", action="store_true",
+        help="use the NumPy grid representation, for very large mazes"
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="don't print the maze or draw the image"
+    )
+    parser.add_argument("--cell-size", type=int, default=50, help="pixels per cell in the image")
+    parser.add_argument(
+        "--tile", type=int, metavar="CELLS",
+        help="draw the image as PNG tiles of up to CELLS x CELLS cells"
+    )
+    args = parser.parse_args()
+
+    if args.grid:
+        m, solvers = GridMaze(args.maze), GRID_SOLVERS
+    else:
+        m, solvers = Maze(args.maze), SOLVERS
+    if not args.quiet:
+        print("Maze:")
+        m.print()
+    print("Solving...")
+    start = time.perf_counter()
+    solvers[args.solver](m)
+    seconds = time.perf_counter() - start
+    print("States Explored:", m.num_explored)
+    print(f"Solved with {args.solver} in {seconds * 1000:.2f} ms.")
+    print(f"Solution: {len(m.solution[0])} steps.")
+    if not args.quiet:
+        m.print()
+        m.output_image(
+            args.output, show_explored=True, cell_size=args.cell_size, tile_cells=args.tile
+        )
+
 
-m = Maze(sys.argv[1])
-print("Maze:")
-m.print()
-print("Solving...")
-m.solve()
-print("States Explored:", m.num_explored)
-print("Solution:")
-m.print()
-m.output_image("maze.png", show_explored=True)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark the maze solvers over a corpus of generated mazes.
+
+For each generator and size, generates a square maze with mazegen.py
+(unless it already exists), then runs every solver on it in a fresh
+process, so peak RSS is measured in isolation. Mazes use the GridMaze
+representation, and small ones the list-based Maze as well. Every run
+appends one JSON line of explored states, path length, load and solve
+time and peak RSS to the output file.
+
+Usage: python mazebench.py [--sizes 10000,1000000,10000000] [--root mazes]
+                           [--generators backtracker,prim,rooms]
+                           [--solvers dfs,bfs,ucs,greedy,astar]
+                           [--output mazebench.jsonl]
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+
+import maze
+from benchmark import peak_rss_mb
+from mazegen import GENERATORS, MIN_SIZE, generate
+
+# Solvers that must agree on the length of the path
+OPTIMAL_SOLVERS = ("bfs", "ucs", "astar")
+
+
+def maze_path(root, generator, size, seed):
+    return os.path.join(root, f"{generator}-{size}-seed-{seed}.txt")
+
+
+def measure(filename, solver, representation="grid"):
+    """
+    Load the maze in `filename`, solve it with `solver` and return one
+    JSON-friendly record of the results.
+    """
+    start = time.perf_counter()
+    if representation == "grid":
+        m, solvers = maze.GridMaze(filename), maze.GRID_SOLVERS
+    else:
+        m, solvers = maze.Maze(filename), maze.SOLVERS
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    solvers[solver](m)
+    return {
+        "maze": filename,
+        "height": m.height,
+        "width": m.width,
+        "solver": solver,
+        "representation": representation,
+        "explored": m.num_explored,
+        "steps": len(m.solution[0]),
+        "load_seconds": load_seconds,
+        "solve_seconds": time.perf_counter() - start,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run(filename, solver, representation, timeout):
+    """
+    Measure one solver on one maze in a fresh process. Returns its record,
+    or a record of the failure if it times out or raises.
+    """
+    record = {"maze": filename, "solver": solver, "representation": representation}
+    try:
+        result = subprocess.run([
+            sys.executable, os.path.abspath(__file__), "--measure", filename,
+            "--solvers", solver, "--representation", representation,
+        ], capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {**record, "error": f"timed out after {timeout} s"}
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        return {**record, "error": lines[-1] if lines else f"exit status {result.returncode}"}
+    return json.loads(result.stdout)
+
+
+def print_record(record):
+    if "error" in record:
+        print(f"  {record['solver']:<8}{record['representation']:<6}{record['error']}")
+        return
+    print(
+        f"  {record['solver']:<8}{record['representation']:<6}{record['explored']:>12}"
+        f"{record['steps']:>10}{record['solve_seconds']:>10.2f} s"
+        f"{record['peak_rss_mb'] or 0:>8.0f} MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,1000000,10000000",
+                        help="comma-separated numbers of cells")
+    parser.add_argument("--generators", default=",".join(GENERATORS))
+    parser.add_argument("--solvers", default=",".join(maze.GRID_SOLVERS))
+    parser.add_argument("--root", default="mazes", help="directory to keep generated mazes in")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--list-limit", type=int, default=100_000,
+                        help="also run the list-based Maze on mazes up to this many cells")
+    parser.add_argument("--timeout", type=float, default=600.0, help="seconds per run")
+    parser.add_argument("--output", default="mazebench.jsonl")
+    parser.add_argument("--measure", metavar="FILE", help=argparse.SUPPRESS)
+    parser.add_argument("--representation", default="grid", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Worker process: measure one run and report it on stdout
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.solvers, args.representation)))
+        return
+
+    solvers = args.solvers.split(",")
+    for solver in solvers:
+        if solver not in maze.GRID_SOLVERS:
+            parser.error(f"unknown solver: {solver}")
+    os.makedirs(args.root, exist_ok=True)
+
+    for size in (int(size) for size in args.sizes.split(",")):
+        side = max(MIN_SIZE, math.isqrt(size))
+        for generator in args.generators.split(","):
+            filename = maze_path(args.root, generator, size, args.seed)
+            if not os.path.exists(filename):
+                print(f"Generating a {side} x {side} {generator} maze in {filename}...")
+                generate(filename, side, side, generator, args.seed)
+
+            print(f"Benchmarking {filename}...")
+            representations = ["grid"] + (["list"] if side * side <= args.list_limit else [])
+            steps = {}
+            for representation in representations:
+                for solver in solvers:
+                    record = run(filename, solver, representation, args.timeout)
+                    record.update(generator=generator, cells=side * side, seed=args.seed)
+                    print_record(record)
+                    with open(args.output, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record) + "\n")
+                    if solver in OPTIMAL_SOLVERS and "steps" in record:
+                        steps[representation, solver] = record["steps"]
+            if len(set(steps.values())) > 1:
+                raise AssertionError(f"solvers disagree on {filename}: {steps}")
+
+    print(f"Results appended to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Generate seeded mazes in the text format maze.py reads.
+
+Walls are "#", open cells " ", and the start and goal "A" and "B".
+The generators are:
+
+    backtracker  recursive backtracker (randomized depth-first search):
+                 a perfect maze of long, winding corridors
+    prim         randomized Prim's algorithm: a perfect maze of many
+                 short dead ends
+    rooms        open rooms in a grid, joined by one door in each wall
+
+The maze is built in a bytearray holding its text, one byte per cell,
+and written a row at a time, so sizes up to 10^8 cells need about that
+many bytes of memory, plus the generator's stack or frontier.
+
+Usage: python mazegen.py maze.txt [--height H] [--width W]
+                         [--generator backtracker] [--seed S]
+"""
+
+import argparse
+import random
+from array import array
+
+WALL, OPEN, UNVISITED, FRONTIER = b"#", b" ", b".", b"f"
+
+# Side length of a room in the rooms generator, walls included
+ROOM_SIZE = 16
+
+# Smallest side with two lattice cells, so the start and goal differ
+MIN_SIZE = 5
+
+
+class Grid():
+    """
+    The text of an H x W maze as a bytearray, row after row without
+    newlines, plus a spare row of walls so that stepping off any edge,
+    including with a negative index, lands on a wall.
+    """
+
+    def __init__(self, height, width):
+        if height < MIN_SIZE or width < MIN_SIZE:
+            raise ValueError(f"maze must be at least {MIN_SIZE} x {MIN_SIZE}")
+        self.height = height
+        self.width = width
+        self.cells = bytearray(WALL) * ((height + 1) * width)
+
+    def index(self, row, col):
+        return row * self.width + col
+
+    def lattice(self):
+        """
+        Mark every cell at odd (row, col) UNVISITED and return the
+        indices of the first and last of them. Perfect-maze generators
+        carve between these cells, two steps apart.
+        """
+        columns = range(1, self.width - 1, 2)
+        row = bytearray(WALL) * self.width
+        row[1:self.width - 1:2] = UNVISITED * len(columns)
+        rows = range(1, self.height - 1, 2)
+        for i in rows:
+            self.cells[i * self.width:(i + 1) * self.width] = row
+        return self.index(1, 1), self.index(rows[-1], columns[-1])
+
+    def write(self, filename, start, goal):
+        """
+        Write the maze with "A" at index `start` and "B" at `goal`.
+        """
+        self.cells[start], self.cells[goal] = ord("A"), ord("B")
+        width = self.width
+        with open(filename, "wb") as f:
+            for i in range(self.height):
+                f.write(self.cells[i * width:(i + 1) * width] + b"\n")
+
+
+def backtracker(grid, rng):
+    """
+    Carve a perfect maze by randomized depth-first search from the first
+    lattice cell, keeping the path back as a stack of indices.
+    """
+    start, goal = grid.lattice()
+    cells, steps = grid.cells, (-2 * grid.width, 2 * grid.width, -2, 2)
+    unvisited = ord(UNVISITED)
+
+    cells[start] = ord(OPEN)
+    stack = array("q", [start])
+    while stack:
+        cell = stack[-1]
+        candidates = [step for step in steps if cells[cell + step] == unvisited]
+        if not candidates:
+            stack.pop()
+            continue
+        step = candidates[rng.randrange(len(candidates))]
+        cells[cell + step // 2] = cells[cell + step] = ord(OPEN)
+        stack.append(cell + step)
+    return start, goal
+
+
+def prim(grid, rng):
+    """
+    Carve a perfect maze by randomized Prim's algorithm: repeatedly join
+    a random frontier cell to a random carved neighbor, then add its
+    unvisited neighbors to the frontier.
+    """
+    start, goal = grid.lattice()
+    cells, steps = grid.cells, (-2 * grid.width, 2 * grid.width, -2, 2)
+    unvisited, carved, frontier_mark = ord(UNVISITED), ord(OPEN), ord(FRONTIER)
+
+    frontier = array("q")
+
+    def add_neighbors(cell):
+        for step in steps:
+            if cells[cell + step] == unvisited:
+                cells[cell + step] = frontier_mark
+                frontier.append(cell + step)
+
+    cells[start] = carved
+    add_neighbors(start)
+    while frontier:
+        # Remove a random frontier cell by swapping it with the last
+        i = rng.randrange(len(frontier))
+        cell = frontier[i]
+        frontier[i] = frontier[-1]
+        frontier.pop()
+
+        joins = [step for step in steps if cells[cell + step] == carved]
+        step = joins[rng.randrange(len(joins))]
+        cells[cell + step // 2] = cells[cell] = carved
+        add_neighbors(cell)
+    return start, goal
+
+
+def rooms(grid, rng, room_size=ROOM_SIZE):
+    """
+    Divide the maze into open rooms of `room_size` cells a side, walls
+    included, and open one random door in each wall between two rooms,
+    so every room is reachable and there are many routes between them.
+    """
+    height, width, cells = grid.height, grid.width, grid.cells
+
+    # Every room keeps at least one open row and column
+    wall_rows = list(range(0, height - 2, room_size)) + [height - 1]
+    wall_cols = list(range(0, width - 2, room_size)) + [width - 1]
+
+    # Rows inside rooms are open between the room walls
+    inside = bytearray(OPEN) * width
+    for col in wall_cols:
+        inside[col] = ord(WALL)
+    for top, bottom in zip(wall_rows, wall_rows[1:]):
+        for i in range(top + 1, bottom):
+            cells[i * width:(i + 1) * width] = inside
+
+    # A door in each wall segment, between rows and between columns
+    for top, bottom in zip(wall_rows, wall_rows[1:]):
+        for left, right in zip(wall_cols, wall_cols[1:]):
+            if right < width - 1:
+                cells[grid.index(rng.randrange(top + 1, bottom), right)] = ord(OPEN)
+            if bottom < height - 1:
+                cells[grid.index(bottom, rng.randrange(left + 1, right))] = ord(OPEN)
+
+    return grid.index(1, 1), grid.index(height - 2, width - 2)
+
+
+GENERATORS = {
+    "backtracker": backtracker,
+    "prim": prim,
+    "rooms": rooms,
+}
+
+
+def generate(filename, height, width, generator="backtracker", seed=0):
+    """
+    Write a `height` x `width` maze made by `generator` to `filename`.
+    The same seed always gives the same maze.
+    """
+    grid = Grid(height, width)
+    start, goal = GENERATORS[generator](grid, random.Random(seed))
+    grid.write(filename, start, goal)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("filename")
+    parser.add_argument("--height", type=int, default=101)
+    parser.add_argument("--width", type=int, default=101)
+    parser.add_argument("--generator", choices=GENERATORS, default="backtracker")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate(args.filename, args.height, args.width, args.generator, args.seed)
+    print(f"Wrote a {args.height} x {args.width} {args.generator} maze to {args.filename}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Name index for looking people up by prefix or by misspelled name.
+
+Entries are kept in lowercase-name order for prefix autocomplete by
+binary search. Fuzzy lookups use a trigram index to find candidates
+sharing enough trigrams with the query, then verify them with a bounded
+edit distance, so only a handful of names are ever compared in full.
+Queries too short to be sure of sharing a trigram with every match
+are checked instead against the names of nearby lengths, which are
+bucketed alongside the trigrams.
+"""
+
+import sys
+from array import array
+from bisect import bisect_left, insort
+from heapq import merge, nlargest
+from itertools import chain
+
+from graph import format_year
+
+
+class NameIndex():
+
+    def __init__(self, size, name, person_id, birth, popularity, order=None):
+        """
+        Index `size` entries, where name(i), person_id(i), birth(i) and
+        popularity(i) describe entry i. `order` may give the entries
+        already sorted by lowercase name.
+        """
+        self.size = size
+        self.name = name
+        self.person_id = person_id
+        self.birth = birth
+        self.popularity = popularity
+        if order is None:
+            order = array("i", sorted(range(size), key=lambda i: name(i).lower()))
+        self.order = order
+        self.trigrams = None
+        self.lengths = None
+
+    @classmethod
+    def from_graph(cls, graph):
+        return cls(
+            graph.num_people,
+            name=graph.person_names.__getitem__,
+            person_id=graph.person_id,
+            birth=lambda p: format_year(graph.person_births[p]),
+            popularity=lambda p: graph.person_offsets[p + 1] - graph.person_offsets[p],
+            order=graph.name_order,
+        )
+
+    @classmethod
+    def from_people(cls, people):
+        person_ids = list(people)
+        index = cls(
+            len(person_ids),
+            name=lambda i: people[person_ids[i]]["name"],
+            person_id=person_ids.__getitem__,
+            birth=lambda i: people[person_ids[i]]["birth"],
+            popularity=lambda i: len(people[person_ids[i]]["movies"]),
+        )
+        index.person_ids = person_ids
+        return index
+
+    def add_people(self, person_ids):
+        """
+        Index people since added to the `people` dict of `from_people`.
+        """
+        start = len(self.person_ids)
+        self.person_ids.extend(person_ids)
+        self.extend(range(start, len(self.person_ids)))
+
+    def extend(self, entries):
+        """
+        Add new `entries`, which the accessors must already describe, to
+        the name order and to the trigram postings if they are built.
+        """
+        key = lambda i: self.name(i).lower()
+        self.order = array("i", merge(self.order, sorted(entries, key=key), key=key))
+        self.size += len(entries)
+        if self.trigrams is not None:
+            for i in entries:
+                self.add_postings(i)
+
+    def renumber(self, graph, people_map):
+        """
+        Returns the index of `graph` after merge_delta renumbered its
+        people with `people_map`. Built postings are carried over through
+        the map, which keeps them sorted, and only the inserted people
+        are posted afresh, in place.
+        """
+        index = NameIndex.from_graph(graph)
+        if self.trigrams is not None:
+            table = people_map.table.__getitem__
+            index.trigrams = {
+                gram: array("i", map(table, posting))
+                for gram, posting in self.trigrams.items()
+            }
+            index.lengths = {
+                length: array("i", map(table, posting))
+                for length, posting in self.lengths.items()
+            }
+            for p in people_map.inserted():
+                index.add_postings(p, insort)
+        return index
+
+    def candidate(self, i, distance=0):
+        return {
+            "id": self.person_id(i),
+            "name": self.name(i),
+            "birth": self.birth(i),
+            "distance": distance,
+        }
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to `limit` candidates whose name starts with `prefix`,
+        ignoring case, most popular first.
+        """
+        prefix = prefix.lower()
+        key = lambda i: self.name(i).lower()
+        start = bisect_left(self.order, prefix, key=key)
+        end = bisect_left(self.order, prefix + chr(sys.maxunicode), lo=start, key=key)
+        # Rank every match, since popularity is unrelated to name order
+        matches = nlargest(limit, self.order[start:end], key=self.popularity)
+        return [self.candidate(i) for i in matches]
+
+    def fuzzy(self, query, max_distance=2, limit=10):
+        """
+        Returns up to `limit` candidates within `max_distance` edits of
+        `query`, ignoring case, ranked by distance then popularity.
+        """
+        if self.trigrams is None:
+            self.build_trigrams()
+
+        # An edit changes at most 3 padded trigrams, so any match within
+        # max_distance shares all but 3 * max_distance of the query's,
+        # and so must appear in at least one of its rarest trigrams. Short
+        # queries may share none, so every name of a close length is a
+        # candidate instead
+        query = query.lower()
+        grams = trigrams(query)
+        needed = len(grams) - 3 * max_distance
+        if needed > 0:
+            rarest = sorted(grams, key=lambda gram: len(self.trigrams.get(gram, ())))
+            candidates = set()
+            for gram in rarest[:len(grams) - needed + 1]:
+                candidates.update(self.trigrams.get(gram, ()))
+        else:
+            candidates = chain.from_iterable(
+                self.lengths.get(length, ())
+                for length in range(len(query) - max_distance, len(query) + max_distance + 1)
+            )
+
+        matches = []
+        for i in candidates:
+            name = self.name(i).lower()
+            if abs(len(name) - len(query)) > max_distance:
+                continue
+            if needed > 0 and len(grams & trigrams(name)) < needed:
+                continue
+            distance = edit_distance(query, name, max_distance)
+            if distance is not None:
+                matches.append((distance, -self.popularity(i), i))
+        matches.sort()
+        return [self.candidate(i, distance) for distance, _, i in matches[:limit]]
+
+    def build_trigrams(self):
+        """
+        Build the trigram -> entries and name length -> entries posting
+        lists used by `fuzzy`.
+        """
+        self.trigrams, self.lengths = {}, {}
+        for i in range(self.size):
+            self.add_postings(i)
+
+    def add_postings(self, i, add=array.append):
+        name = self.name(i).lower()
+        for gram in trigrams(name):
+            add(self.trigrams.setdefault(gram, array("i")), i)
+        add(self.lengths.setdefault(len(name), array("i")), i)
+
+
+def trigrams(text):
+    """
+    Returns the set of trigrams of `text`, padded so that its start
+    and end form trigrams of their own.
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, bound):
+    """
+    Returns the Levenshtein distance between `a` and `b`,
+    or None if it exceeds `bound`.
+    """
+    if abs(len(a) - len(b)) > bound:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        if min(current) > bound:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= bound else None
@@ -0,0 +1,59 @@
+"""
+Scaling benchmark suite for degrees on synthetic datasets.
+
+For each size, generates a dataset with generate.py (unless it already
+exists) and runs benchmark.py once per storage mode in a fresh process,
+so peak RSS is measured in isolation. Every run appends one JSON line of
+load time, peak RSS and per-mode latency percentiles to the output file.
+
+Usage: python scaling.py [--sizes 10000,100000,1000000] [--root synthetic]
+                         [--storages dict,compact,sqlite] [--output scaling.jsonl]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+from generate import generate
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def dataset_directory(root, size, seed):
+    return os.path.join(root, f"people-{size}-seed-{seed}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="comma-separated numbers of people")
+    parser.add_argument("--root", default="synthetic",
+                        help="directory to keep generated datasets in")
+    parser.add_argument("--storages", default="dict,compact,sqlite")
+    parser.add_argument("--modes", default="bipartite,bidirectional")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="scaling.jsonl")
+    args = parser.parse_args()
+
+    for size in (int(size) for size in args.sizes.split(",")):
+        directory = dataset_directory(args.root, size, args.seed)
+        if not os.path.exists(os.path.join(directory, "stars.csv")):
+            print(f"Generating {size} people in {directory}...")
+            generate(directory, size, seed=args.seed)
+
+        for storage in args.storages.split(","):
+            print(f"Benchmarking {size} people with {storage} storage...")
+            subprocess.run([
+                sys.executable, os.path.join(HERE, "benchmark.py"), directory,
+                "--storage", storage, "--modes", args.modes,
+                "--queries", str(args.queries), "--seed", str(args.seed),
+                "--json", args.output,
+            ], check=True)
+
+    print(f"Results appended to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
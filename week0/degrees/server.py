@@ -0,0 +1,379 @@
+"""
+Local HTTP/JSON query server for degrees.
+
+The dataset is loaded once, then asyncio serves requests concurrently.
+Path searches run on a process pool (forked from the loaded server where
+the platform allows, so workers share its memory copy-on-write); name
+lookups run on a thread so the event loop never blocks. Every search has
+a timeout, enforced inside the worker where the platform has interval
+timers, and a budget of expanded nodes.
+
+Endpoints, all GET with query string parameters:
+
+    /path?source=ID&target=ID[&mode=bfs]
+    /paths?source=ID&target=ID[&k=K][&limit=100], with k and limit at most 1000
+    /names?q=TEXT[&match=exact|prefix|fuzzy][&limit=10], with limit at most 100
+    /health
+
+Usage: python server.py [directory] [--port 8050] [--workers N] [--landmarks K]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import signal
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import degrees
+from landmarks import landmarks_path
+
+MAX_REQUEST_BYTES = 64 * 1024
+
+# Most paths one /paths request may ask for, as limit or k
+MAX_PATHS = 1000
+
+# Most candidates one /names request may ask for
+MAX_NAMES = 100
+
+# Extra seconds the server waits for a worker to report its own timeout
+TIMEOUT_GRACE = 1.0
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class SearchTimeout(Exception):
+    """
+    Raised in a worker when a search runs past its deadline.
+    """
+
+
+class DegreesServer():
+
+    def __init__(self, workers=None, timeout=10.0, max_expanded=1_000_000, dataset=None):
+        """
+        Serve the dataset already loaded into `degrees`. `dataset` is the
+        (directory, load_data options, landmarks) triple workers load
+        themselves on platforms that cannot fork.
+        """
+        self.timeout = timeout
+        self.max_expanded = max_expanded
+        # SQLite connections must not cross a fork, so with sqlite storage
+        # workers are spawned and open the database themselves
+        if "fork" in multiprocessing.get_all_start_methods() and degrees.store is None:
+            self.pool = ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context("fork")
+            )
+        else:
+            self.pool = ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=dataset,
+            )
+        # Start the workers now, before any socket is open: forked lazily
+        # from a request they would inherit the listener and the client's
+        # connection, which then never sees EOF
+        self.pool.submit(int).result()
+        self.routes = {
+            "/path": self.path,
+            "/paths": self.paths,
+            "/names": self.names,
+            "/health": self.health,
+        }
+
+    async def start(self, host="127.0.0.1", port=8050):
+        """
+        Start listening and return the asyncio.Server; port 0 picks a free port.
+        """
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    async def handle(self, reader, writer):
+        try:
+            try:
+                route, params = await self.read_request(reader)
+                handler = self.routes.get(route)
+                if handler is None:
+                    raise HTTPError(HTTPStatus.NOT_FOUND, f"no such endpoint: {route}")
+                status, body = HTTPStatus.OK, await handler(params)
+            except HTTPError as e:
+                status, body = e.status, {"error": e.message}
+            except Exception as e:
+                status, body = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+            self.write_response(writer, status, body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        """
+        Returns the path and query parameters of a GET request.
+        """
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.timeout)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed request")
+        if len(head) > MAX_REQUEST_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "request too large")
+
+        try:
+            method, target, _ = head.decode("latin-1").split("\r\n", 1)[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed request line")
+        if method != "GET":
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "only GET is supported")
+
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        return url.path, params
+
+    def write_response(self, writer, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + payload
+        )
+
+    async def path(self, params):
+        source, target = _require(params, "source"), _require(params, "target")
+        mode = params.get("mode", "bfs")
+        if mode not in degrees.SEARCH_MODES:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"unknown search mode: {mode}")
+        if mode == "alt" and degrees.landmarks is None:
+            raise HTTPError(
+                HTTPStatus.BAD_REQUEST, "alt mode needs a server started with --landmarks"
+            )
+        for person_id in (source, target):
+            if person_id not in degrees.people:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"unknown person: {person_id}")
+
+        loop = asyncio.get_running_loop()
+        search = partial(
+            _search, source, target, mode, self.max_expanded, time.time() + self.timeout
+        )
+        try:
+            path, stats = await asyncio.wait_for(
+                loop.run_in_executor(self.pool, search), self.timeout + TIMEOUT_GRACE
+            )
+        except (asyncio.TimeoutError, SearchTimeout):
+            raise HTTPError(HTTPStatus.GATEWAY_TIMEOUT, "search timed out")
+        except degrees.SearchLimitExceeded as e:
+            raise HTTPError(HTTPStatus.UNPROCESSABLE_ENTITY, str(e))
+
+        return {
+            "source": source,
+            "target": target,
+            "degrees": None if path is None else len(path),
+            "path": path,
+            "stats": stats,
+        }
+
+    async def paths(self, params):
+        """
+        Lists up to `limit` equally short paths, or with `k`, the k
+        shortest paths including longer alternatives.
+        """
+        source, target = _require(params, "source"), _require(params, "target")
+        try:
+            k = int(params["k"]) if "k" in params else None
+            limit = int(params.get("limit", 100))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "k and limit must be integers")
+        for name, value in (("k", k), ("limit", limit)):
+            if value is not None and not 0 <= value <= MAX_PATHS:
+                raise HTTPError(
+                    HTTPStatus.BAD_REQUEST, f"{name} must be between 0 and {MAX_PATHS}"
+                )
+        for person_id in (source, target):
+            if person_id not in degrees.people:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"unknown person: {person_id}")
+
+        loop = asyncio.get_running_loop()
+        search = partial(
+            _search_paths, source, target, k, limit, self.max_expanded,
+            time.time() + self.timeout,
+        )
+        try:
+            paths, stats = await asyncio.wait_for(
+                loop.run_in_executor(self.pool, search), self.timeout + TIMEOUT_GRACE
+            )
+        except asyncio.TimeoutError:
+            raise HTTPError(HTTPStatus.GATEWAY_TIMEOUT, "search timed out")
+
+        return {"source": source, "target": target, "paths": paths, "stats": stats}
+
+    async def names(self, params):
+        query = _require(params, "q")
+        match = params.get("match", "exact")
+        try:
+            limit = int(params.get("limit", 10))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "limit must be an integer")
+        if not 1 <= limit <= MAX_NAMES:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"limit must be between 1 and {MAX_NAMES}")
+
+        if match == "exact":
+            lookup = partial(_exact_names, query)
+        elif match == "prefix":
+            lookup = partial(degrees.complete_name, query, limit)
+        elif match == "fuzzy":
+            lookup = partial(degrees.find_names, query, limit=limit)
+        else:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"unknown match: {match}")
+
+        loop = asyncio.get_running_loop()
+        try:
+            candidates = await asyncio.wait_for(
+                loop.run_in_executor(None, lookup), self.timeout
+            )
+        except asyncio.TimeoutError:
+            raise HTTPError(HTTPStatus.GATEWAY_TIMEOUT, "lookup timed out")
+        return {"query": query, "candidates": candidates}
+
+    async def health(self, params):
+        return {"status": "ok", "people": len(degrees.people)}
+
+
+def _require(params, key):
+    if key not in params:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"missing parameter: {key}")
+    return params[key]
+
+
+@contextmanager
+def _deadline(deadline):
+    """
+    Raise SearchTimeout in this process once time.time() passes
+    `deadline`. Only the main thread of a process on a platform with
+    interval timers can be interrupted; elsewhere this does nothing and
+    the server's own timeout applies.
+    """
+    if not hasattr(signal, "setitimer"):
+        yield
+        return
+
+    def expire(signum, frame):
+        raise SearchTimeout("search timed out")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, max(deadline - time.time(), 0.001))
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _search(source, target, mode, max_expanded, deadline):
+    stats = {}
+    with _deadline(deadline):
+        path = degrees.shortest_path(
+            source, target, mode=mode, stats=stats, max_expanded=max_expanded
+        )
+    return path, stats
+
+
+def _search_paths(source, target, k, limit, max_expanded, deadline):
+    """
+    Returns the paths found before the limit, or before the search budget
+    or deadline runs out, in which case `stats` records that it was
+    limited.
+    """
+    stats = {}
+    if k is None:
+        found = degrees.all_shortest_paths(
+            source, target, stats=stats, max_expanded=max_expanded
+        )
+    else:
+        found = degrees.k_shortest_paths(
+            source, target, k, stats=stats, max_expanded=max_expanded
+        )
+    paths = []
+    try:
+        with _deadline(deadline):
+            paths.extend(islice(found, limit))
+    except (degrees.SearchLimitExceeded, SearchTimeout):
+        stats["limited"] = True
+    return paths, stats
+
+
+def _exact_names(query):
+    return [
+        {
+            "id": person_id,
+            "name": degrees.people[person_id]["name"],
+            "birth": degrees.people[person_id]["birth"],
+            "distance": 0,
+        }
+        for person_id in sorted(degrees.names.get(query.lower(), ()))
+    ]
+
+
+def _init_worker(directory, options, landmarks=None):
+    degrees.load_data(directory, **options)
+    if landmarks:
+        degrees.build_landmarks(landmarks, landmarks_path(directory), directory)
+
+
+async def serve(server, host, port):
+    listener = await server.start(host, port)
+    address = listener.sockets[0].getsockname()
+    print(f"Serving on http://{address[0]}:{address[1]}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--workers", type=int, help="number of search processes")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds per request")
+    parser.add_argument("--max-expanded", type=int, default=1_000_000)
+    parser.add_argument("--storage", choices=degrees.STORAGE_MODES, default="compact")
+    parser.add_argument("--snapshot", action="store_true")
+    parser.add_argument(
+        "--landmarks", type=int, metavar="K",
+        help="build or load a K-landmark index for alt mode (needs compact storage)"
+    )
+    args = parser.parse_args()
+
+    options = {"storage": args.storage, "snapshot": args.snapshot}
+    print("Loading data...")
+    degrees.load_data(args.directory, **options)
+    if args.landmarks:
+        degrees.build_landmarks(args.landmarks, landmarks_path(args.directory), args.directory)
+    print("Data loaded.")
+
+    server = DegreesServer(
+        workers=args.workers, timeout=args.timeout, max_expanded=args.max_expanded,
+        dataset=(args.directory, options, args.landmarks),
+    )
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Versioned binary snapshots of a CompactGraph.
+
+A snapshot holds every array of the graph back to back after a small
+JSON header, so later runs can memory-map the file and use the arrays
+in place instead of re-parsing the CSV files. The header records the
+size, mtime (and optionally a hash) of each source CSV; a snapshot whose
+sources have changed is treated as stale and rebuilt. It also lists the
+deltas (see delta.py) merged in since the sources were read.
+
+Usage: python snapshot.py [directory]
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+
+from graph import CompactGraph
+
+MAGIC = b"DEGSNAP\0"
+SNAPSHOT_VERSION = 2
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+FILENAME = "degrees.snapshot"
+ALIGNMENT = 8
+
+
+class StringTable():
+    """
+    Read-only list of strings stored as UTF-8 bytes plus an offsets array.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def from_strings(cls, strings):
+        offsets = array("q", [0])
+        blob = bytearray()
+        for s in strings:
+            blob += s.encode("utf-8")
+            offsets.append(len(blob))
+        return cls(offsets, blob)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def snapshot_path(directory):
+    return os.path.join(directory, FILENAME)
+
+
+def fingerprint(directory, hashes=False):
+    """
+    Returns the size and mtime of each source CSV in `directory`,
+    plus its SHA-256 digest if `hashes` is set.
+    """
+    sources = {}
+    for name in SOURCES:
+        path = os.path.join(directory, name)
+        stat = os.stat(path)
+        source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        if hashes:
+            source["sha256"] = _sha256(path)
+        sources[name] = source
+    return sources
+
+
+def write_snapshot(graph, directory, path=None):
+    """
+    Write `graph` to a snapshot for the CSV files in `directory`. A graph
+    read from a snapshot keeps its recorded fingerprint, so rewriting it
+    after merging deltas does not re-hash the sources.
+    """
+    if path is None:
+        path = snapshot_path(directory)
+
+    # Collect every section to store, with strings split into two arrays
+    sections = {name: getattr(graph, name) for name in graph.ARRAYS}
+    for name in graph.STRINGS:
+        table = getattr(graph, name)
+        if not isinstance(table, StringTable):
+            table = StringTable.from_strings(table)
+        sections[f"{name}.offsets"] = table.offsets
+        sections[f"{name}.blob"] = table.blob
+
+    # Lay the sections out after the header, each aligned
+    layout = {}
+    position = 0
+    for name, section in sections.items():
+        view = memoryview(section)
+        layout[name] = [view.format, position, len(view)]
+        position = _align(position + view.nbytes)
+
+    if graph.sources is None:
+        graph.sources = fingerprint(directory, hashes=True)
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "sources": graph.sources,
+        "deltas": graph.deltas,
+        "sections": layout,
+    }).encode("utf-8")
+    start = _align(len(MAGIC) + 8 + len(header))
+
+    # Write to a unique temporary file so concurrent writers never clash
+    fd, temp = tempfile.mkstemp(
+        prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path) or "."
+    )
+    try:
+        with open(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(SNAPSHOT_VERSION.to_bytes(4, "little"))
+            f.write(len(header).to_bytes(4, "little"))
+            f.write(header)
+            for name, section in sections.items():
+                f.write(bytes(start + layout[name][1] - f.tell()))
+                f.write(memoryview(section).cast("B"))
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+
+def read_snapshot(directory, path=None, verify=False):
+    """
+    Memory-map the snapshot for `directory` and return its graph, or None
+    if there is no snapshot or it is stale. With `verify`, source files
+    are also re-hashed rather than trusted on size and mtime alone.
+    """
+    if path is None:
+        path = snapshot_path(directory)
+
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # Check the header before trusting any of the data
+    if data[:len(MAGIC)] != MAGIC:
+        return None
+    version = int.from_bytes(data[8:12], "little")
+    if version != SNAPSHOT_VERSION:
+        return None
+    length = int.from_bytes(data[12:16], "little")
+    header = json.loads(data[16:16 + length])
+    if header["byteorder"] != sys.byteorder:
+        return None
+    if not sources_match(header["sources"], directory, verify):
+        return None
+
+    start = _align(16 + length)
+    view = memoryview(data)
+    sections = {}
+    for name, (typecode, offset, count) in header["sections"].items():
+        section = view[start + offset:]
+        if typecode == "B":
+            sections[name] = section[:count]
+        else:
+            sections[name] = section[:count * array(typecode).itemsize].cast(typecode)
+
+    graph = CompactGraph()
+    for name in graph.ARRAYS:
+        setattr(graph, name, sections[name])
+    for name in graph.STRINGS:
+        setattr(graph, name, StringTable(
+            sections[f"{name}.offsets"], sections[f"{name}.blob"]
+        ))
+    graph.deltas = header.get("deltas", [])
+    graph.sources = header["sources"]
+    graph.mmap = data
+    return graph
+
+
+def load_snapshot(directory, path=None, verify=False, build=CompactGraph.from_csv):
+    """
+    Returns the graph for `directory`, from its snapshot if that is
+    fresh, otherwise building it with `build(directory)` and writing
+    a new snapshot.
+    """
+    graph = read_snapshot(directory, path=path, verify=verify)
+    if graph is None:
+        write_snapshot(build(directory), directory, path=path)
+        graph = read_snapshot(directory, path=path)
+    return graph
+
+
+def sources_match(sources, directory, verify=False):
+    """
+    Returns whether the source CSVs in `directory` still match the
+    `fingerprint` in `sources`, re-hashing them too with `verify`.
+    """
+    try:
+        current = fingerprint(directory, hashes=False)
+    except FileNotFoundError:
+        return False
+    for name, source in current.items():
+        stored = sources.get(name)
+        if stored is None:
+            return False
+        if source["size"] != stored["size"] or source["mtime_ns"] != stored["mtime_ns"]:
+            return False
+        if verify and _sha256(os.path.join(directory, name)) != stored["sha256"]:
+            return False
+    return True
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _align(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python snapshot.py [directory]")
+    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+
+    print("Loading data...")
+    graph = CompactGraph.from_csv(directory)
+    print("Writing snapshot...")
+    write_snapshot(graph, directory)
+    print(f"Snapshot written to {snapshot_path(directory)}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,448 @@
+"""
+SQLite-backed storage for the degrees dataset, for machines that cannot
+hold the whole graph in memory.
+
+The CSV files are imported once into an indexed SQLite database next to
+them, which is rebuilt when they change. Searches then fetch each
+person's movies and each movie's stars on demand, through an LRU cache
+of adjacency lists in front of SQLite's own bounded page cache, so the
+working set stays bounded however large the dataset is.
+
+People are stored in lowercase-name order with a trigram posting
+table beside them, so SQLiteNameIndex answers prefix and fuzzy name
+lookups from indexes without loading any names into memory.
+
+Usage: python sqlitestore.py [directory]
+"""
+
+import csv
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from array import array
+from collections.abc import Mapping
+from functools import lru_cache
+from itertools import groupby
+
+from graph import connected_components
+from nameindex import edit_distance, trigrams
+from snapshot import fingerprint
+
+SCHEMA_VERSION = 2
+FILENAME = "degrees.sqlite"
+
+# Adjacency lists kept in the LRU cache, and SQLite's page cache size
+CACHE_ENTRIES = 16384
+PAGE_CACHE_MB = 16
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+CREATE TABLE people (
+    idx INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    name_lower TEXT NOT NULL,
+    name_length INTEGER NOT NULL,
+    birth TEXT NOT NULL,
+    movies INTEGER NOT NULL DEFAULT 0,
+    component INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE trigrams (gram TEXT NOT NULL, idx INTEGER NOT NULL,
+    PRIMARY KEY (gram, idx)) WITHOUT ROWID;
+CREATE TABLE trigram_counts (gram TEXT PRIMARY KEY, count INTEGER NOT NULL)
+    WITHOUT ROWID;
+CREATE TABLE movies (id TEXT PRIMARY KEY, title TEXT NOT NULL, year TEXT NOT NULL)
+    WITHOUT ROWID;
+CREATE TABLE stars (person_id TEXT NOT NULL, movie_id TEXT NOT NULL,
+    PRIMARY KEY (person_id, movie_id)) WITHOUT ROWID;
+CREATE TABLE component_sizes (label INTEGER PRIMARY KEY, size INTEGER NOT NULL);
+"""
+
+
+class SQLiteGraph():
+    """
+    Adjacency over a degrees SQLite database, keyed by IMDB id like
+    DictGraph, with recently used adjacency lists cached in memory.
+    """
+
+    def __init__(self, path, cache_entries=CACHE_ENTRIES, page_cache_mb=PAGE_CACHE_MB):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(f"PRAGMA cache_size = {-page_cache_mb * 1024}")
+        self.db.execute("PRAGMA query_only = ON")
+        self.movies_of = lru_cache(cache_entries)(self._movies_of)
+        self.stars_of = lru_cache(cache_entries)(self._stars_of)
+
+    def _movies_of(self, person_id):
+        return tuple(row[0] for row in self.db.execute(
+            "SELECT movie_id FROM stars WHERE person_id = ?", (person_id,)
+        ))
+
+    def _stars_of(self, movie_id):
+        return tuple(row[0] for row in self.db.execute(
+            "SELECT person_id FROM stars INDEXED BY stars_by_movie WHERE movie_id = ?",
+            (movie_id,)
+        ))
+
+    def neighbors(self, person_id):
+        for movie_id in self.movies_of(person_id):
+            for star_id in self.stars_of(movie_id):
+                yield movie_id, star_id
+
+    def neighbors_for_person(self, person_id):
+        return set(self.neighbors(person_id))
+
+    def cache_info(self):
+        """
+        Returns hits, misses and size of the adjacency cache.
+        """
+        people, movies = self.movies_of.cache_info(), self.stars_of.cache_info()
+        return {
+            "hits": people.hits + movies.hits,
+            "misses": people.misses + movies.misses,
+            "entries": people.currsize + movies.currsize,
+        }
+
+    def clear_cache(self):
+        self.movies_of.cache_clear()
+        self.stars_of.cache_clear()
+
+    @property
+    def num_people(self):
+        return self.db.execute("SELECT count(*) FROM people").fetchone()[0]
+
+    def component_sizes(self):
+        return array("i", (row[0] for row in self.db.execute(
+            "SELECT size FROM component_sizes ORDER BY label"
+        )))
+
+    def close(self):
+        self.db.close()
+
+
+class SQLiteNameIndex():
+    """
+    NameIndex lookalike answering prefix and fuzzy queries from the
+    people and trigram tables of an SQLiteGraph.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to `limit` candidates whose name starts with `prefix`,
+        ignoring case, most popular first.
+        """
+        prefix = prefix.lower()
+        rows = self.store.db.execute("""
+            SELECT id, name, birth FROM people
+            WHERE name_lower >= ? AND name_lower < ?
+            ORDER BY movies DESC, idx LIMIT ?
+        """, (prefix, prefix + chr(sys.maxunicode), limit))
+        return [_candidate(*row) for row in rows]
+
+    def fuzzy(self, query, max_distance=2, limit=10):
+        """
+        Returns up to `limit` candidates within `max_distance` edits of
+        `query`, ignoring case, ranked by distance then popularity.
+        """
+        # Candidates share one of the query's rarest trigrams, or for
+        # queries too short for that, have a name of a close length,
+        # as in NameIndex.fuzzy
+        query = query.lower()
+        grams = trigrams(query)
+        needed = len(grams) - 3 * max_distance
+        lengths = (len(query) - max_distance, len(query) + max_distance)
+        if needed > 0:
+            placeholders = ", ".join("?" * len(grams))
+            counts = dict(self.store.db.execute(
+                f"SELECT gram, count FROM trigram_counts WHERE gram IN ({placeholders})",
+                list(grams),
+            ))
+            rarest = sorted(grams, key=lambda gram: counts.get(gram, 0))
+            rarest = rarest[:len(grams) - needed + 1]
+            rows = self.store.db.execute(f"""
+                SELECT idx, id, name, name_lower, birth, movies FROM people
+                WHERE idx IN (SELECT idx FROM trigrams WHERE gram IN
+                    ({", ".join("?" * len(rarest))}))
+                AND name_length BETWEEN ? AND ?
+            """, (*rarest, *lengths))
+        else:
+            rows = self.store.db.execute("""
+                SELECT idx, id, name, name_lower, birth, movies FROM people
+                INDEXED BY people_by_length WHERE name_length BETWEEN ? AND ?
+            """, lengths)
+
+        matches = []
+        for idx, person_id, name, name_lower, birth, movies in rows:
+            if needed > 0 and len(grams & trigrams(name_lower)) < needed:
+                continue
+            distance = edit_distance(query, name_lower, max_distance)
+            if distance is not None:
+                matches.append((distance, -movies, idx, person_id, name, birth))
+        matches.sort()
+        return [
+            _candidate(person_id, name, birth, distance)
+            for distance, _, _, person_id, name, birth in matches[:limit]
+        ]
+
+
+def _candidate(person_id, name, birth, distance=0):
+    return {"id": person_id, "name": name, "birth": birth, "distance": distance}
+
+
+class SQLitePeople(Mapping):
+    """
+    Read-only `people` dict lookalike backed by an SQLiteGraph.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, person_id):
+        row = self.store.db.execute(
+            "SELECT name, birth FROM people WHERE id = ?", (person_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(person_id)
+        return {"name": row[0], "birth": row[1], "movies": set(self.store.movies_of(person_id))}
+
+    def __contains__(self, person_id):
+        return self.store.db.execute(
+            "SELECT 1 FROM people WHERE id = ?", (person_id,)
+        ).fetchone() is not None
+
+    def __iter__(self):
+        return (row[0] for row in self.store.db.execute("SELECT id FROM people"))
+
+    def __len__(self):
+        return self.store.num_people
+
+
+class SQLiteMovies(Mapping):
+    """
+    Read-only `movies` dict lookalike backed by an SQLiteGraph.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, movie_id):
+        row = self.store.db.execute(
+            "SELECT title, year FROM movies WHERE id = ?", (movie_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(movie_id)
+        return {"title": row[0], "year": row[1], "stars": set(self.store.stars_of(movie_id))}
+
+    def __contains__(self, movie_id):
+        return self.store.db.execute(
+            "SELECT 1 FROM movies WHERE id = ?", (movie_id,)
+        ).fetchone() is not None
+
+    def __iter__(self):
+        return (row[0] for row in self.store.db.execute("SELECT id FROM movies"))
+
+    def __len__(self):
+        return self.store.db.execute("SELECT count(*) FROM movies").fetchone()[0]
+
+
+class SQLiteNames(Mapping):
+    """
+    Read-only `names` dict lookalike backed by an SQLiteGraph.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, name):
+        person_ids = {row[0] for row in self.store.db.execute(
+            "SELECT id FROM people WHERE name_lower = ?", (name.lower(),)
+        )}
+        if not person_ids:
+            raise KeyError(name)
+        return person_ids
+
+    def __iter__(self):
+        return (row[0] for row in self.store.db.execute(
+            "SELECT DISTINCT name_lower FROM people ORDER BY name_lower"
+        ))
+
+    def __len__(self):
+        return self.store.db.execute(
+            "SELECT count(DISTINCT name_lower) FROM people"
+        ).fetchone()[0]
+
+
+class SQLiteComponents(Mapping):
+    """
+    Read-only `components` dict lookalike backed by an SQLiteGraph.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, person_id):
+        row = self.store.db.execute(
+            "SELECT component FROM people WHERE id = ?", (person_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(person_id)
+        return row[0]
+
+    def __iter__(self):
+        return iter(SQLitePeople(self.store))
+
+    def __len__(self):
+        return self.store.num_people
+
+
+def database_path(directory):
+    return os.path.join(directory, FILENAME)
+
+
+def open_database(directory, path=None, **options):
+    """
+    Returns an SQLiteGraph for the CSV files in `directory`, importing
+    them first if the database is missing or older than they are.
+    """
+    if path is None:
+        path = database_path(directory)
+    if not _fresh(path, directory):
+        import_csv(directory, path)
+    return SQLiteGraph(path, **options)
+
+
+def import_csv(directory, path=None):
+    """
+    Import the CSV files in `directory` into a new SQLite database,
+    streaming rows so memory stays bounded apart from one component
+    label per person. Star rows referencing unknown ids are skipped.
+    """
+    if path is None:
+        path = database_path(directory)
+    # Import into a unique temporary file so concurrent imports never clash
+    fd, temp = tempfile.mkstemp(
+        prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path) or "."
+    )
+    os.close(fd)
+    try:
+        _import_rows(directory, temp)
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+
+def _import_rows(directory, temp):
+    db = sqlite3.connect(temp)
+    db.create_function("py_lower", 1, str.lower, deterministic=True)
+    db.executescript(SCHEMA)
+    db.execute("CREATE TEMP TABLE raw_people (id TEXT PRIMARY KEY, name TEXT, birth TEXT)")
+    db.execute("CREATE TEMP TABLE raw_stars (person_id TEXT, movie_id TEXT)")
+
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        db.executemany(
+            "INSERT OR REPLACE INTO raw_people VALUES (?, ?, ?)",
+            ((row["id"], row["name"], row["birth"]) for row in csv.DictReader(f)),
+        )
+    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+        db.executemany(
+            "INSERT OR REPLACE INTO movies VALUES (?, ?, ?)",
+            ((row["id"], row["title"], row["year"]) for row in csv.DictReader(f)),
+        )
+    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+        db.executemany(
+            "INSERT INTO raw_stars VALUES (?, ?)",
+            ((row["person_id"], row["movie_id"]) for row in csv.DictReader(f)),
+        )
+
+    # Number people in lowercase-name order, as NameIndex ranks ties
+    db.execute("""
+        INSERT INTO people (id, name, name_lower, name_length, birth)
+        SELECT id, name, py_lower(name), length(py_lower(name)), birth FROM raw_people
+        ORDER BY py_lower(name), id
+    """)
+    db.execute("""
+        INSERT OR IGNORE INTO stars
+        SELECT person_id, movie_id FROM raw_stars
+        WHERE person_id IN (SELECT id FROM people) AND movie_id IN (SELECT id FROM movies)
+    """)
+    db.execute("DROP TABLE raw_people")
+    db.execute("DROP TABLE raw_stars")
+    db.execute("CREATE INDEX stars_by_movie ON stars (movie_id, person_id)")
+    db.execute("""
+        UPDATE people SET movies = (SELECT count(*) FROM stars WHERE person_id = people.id)
+    """)
+    db.execute("CREATE INDEX people_by_name ON people (name_lower, movies)")
+    db.execute("CREATE INDEX people_by_length ON people (name_length)")
+
+    # Trigram postings for fuzzy name lookups, sorted before insertion
+    db.execute("CREATE TEMP TABLE raw_trigrams (gram TEXT, idx INTEGER)")
+    db.executemany("INSERT INTO raw_trigrams VALUES (?, ?)", (
+        (gram, idx)
+        for idx, name_lower in db.execute("SELECT idx, name_lower FROM people")
+        for gram in trigrams(name_lower)
+    ))
+    db.execute("INSERT INTO trigrams SELECT gram, idx FROM raw_trigrams ORDER BY gram, idx")
+    db.execute("DROP TABLE raw_trigrams")
+    db.execute("""
+        INSERT INTO trigram_counts SELECT gram, count(*) FROM trigrams GROUP BY gram
+    """)
+
+    # Label connected components from each movie's cast, in movie order
+    size = db.execute("SELECT count(*) FROM people").fetchone()[0]
+    rows = db.execute("""
+        SELECT stars.movie_id, people.idx - 1 FROM stars INDEXED BY stars_by_movie
+        JOIN people ON people.id = stars.person_id ORDER BY stars.movie_id
+    """)
+    labels, sizes = connected_components(size, (
+        [p for _, p in cast] for _, cast in groupby(rows, key=lambda row: row[0])
+    ))
+    db.executemany(
+        "UPDATE people SET component = ? WHERE idx = ?",
+        ((label, p + 1) for p, label in enumerate(labels)),
+    )
+    db.executemany("INSERT INTO component_sizes VALUES (?, ?)", enumerate(sizes))
+    del labels
+
+    db.executemany("INSERT INTO meta VALUES (?, ?)", [
+        ("version", str(SCHEMA_VERSION)),
+        ("sources", json.dumps(fingerprint(directory))),
+    ])
+    db.commit()
+    db.close()
+
+
+def _fresh(path, directory):
+    if not os.path.exists(path):
+        return False
+    try:
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            meta = dict(db.execute("SELECT key, value FROM meta"))
+        finally:
+            db.close()
+        return (
+            meta.get("version") == str(SCHEMA_VERSION)
+            and json.loads(meta["sources"]) == fingerprint(directory)
+        )
+    except (sqlite3.Error, KeyError, FileNotFoundError):
+        return False
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python sqlitestore.py [directory]")
+    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+
+    print("Importing data...")
+    import_csv(directory)
+    print(f"Database written to {database_path(directory)}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Exercise the query server against localhost with the small dataset,
+and check path enumeration and deltas against brute force and full
+reloads.
+
+Usage: python test.py
+"""
+
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import time
+
+import degrees
+from server import DegreesServer, SearchTimeout, _deadline
+
+SMALL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "small")
+
+KEVIN_BACON, TOM_CRUISE, TOM_HANKS = "102", "129", "158"
+
+
+async def get(port, target):
+    """
+    Send one GET request over a raw socket and read the response until
+    the server closes the connection.
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    response = await asyncio.wait_for(reader.read(), 5)
+    writer.close()
+    head, body = response.split(b"\r\n\r\n", 1)
+    return int(head.split()[1]), json.loads(body)
+
+
+async def run_requests(server, targets):
+    listener = await server.start(port=0)
+    port = listener.sockets[0].getsockname()[1]
+    async with listener:
+        return [await get(port, target) for target in targets]
+
+
+def query(targets, **options):
+    degrees.load_data(SMALL, storage="compact")
+    server = DegreesServer(workers=2, **options)
+    try:
+        return asyncio.run(run_requests(server, targets))
+    finally:
+        server.close()
+
+
+def test_health():
+    [(status, body)] = query(["/health"])
+    assert status == 200
+    assert body == {"status": "ok", "people": len(degrees.people)}
+
+
+def test_path():
+    [(status, body)] = query([f"/path?source={KEVIN_BACON}&target={TOM_HANKS}"])
+    assert status == 200
+    assert body["degrees"] == len(degrees.shortest_path(KEVIN_BACON, TOM_HANKS))
+    assert body["path"][-1][1] == TOM_HANKS
+
+
+def test_errors():
+    responses = query([
+        f"/path?source={KEVIN_BACON}",
+        f"/path?source={KEVIN_BACON}&target=0",
+        f"/path?source={KEVIN_BACON}&target={TOM_CRUISE}&mode=nope",
+        f"/path?source={KEVIN_BACON}&target={TOM_CRUISE}&mode=alt",
+        "/nowhere",
+    ])
+    assert [status for status, _ in responses] == [400, 404, 400, 400, 404]
+
+
+def test_paths():
+    responses = query([
+        f"/paths?source={KEVIN_BACON}&target={TOM_HANKS}",
+        f"/paths?source={KEVIN_BACON}&target={TOM_HANKS}&k=2",
+        f"/paths?source={KEVIN_BACON}&target={TOM_HANKS}&k=-1",
+        f"/paths?source={KEVIN_BACON}&target={TOM_HANKS}&limit=1000000",
+    ])
+    assert [status for status, _ in responses] == [200, 200, 400, 400]
+    expected = [
+        [list(step) for step in path]
+        for path in degrees.all_shortest_paths(KEVIN_BACON, TOM_HANKS)
+    ]
+    assert responses[0][1]["paths"] == expected
+    assert len(responses[1][1]["paths"]) == 2
+
+
+def test_budget():
+    [(status, body)] = query(
+        [f"/path?source={KEVIN_BACON}&target={TOM_HANKS}"], max_expanded=0
+    )
+    assert status == 422
+
+
+def test_names():
+    [(status, body), *errors] = query([
+        "/names?q=tom&match=prefix",
+        "/names?q=tom&match=prefix&limit=-1",
+        "/names?q=tom&match=fuzzy&limit=1000000",
+    ])
+    assert status == 200
+    assert [status for status, _ in errors] == [400, 400]
+    assert {candidate["id"] for candidate in body["candidates"]} >= {TOM_CRUISE, TOM_HANKS}
+
+
+def simple_paths(source, target):
+    """
+    Returns every path from source to target that repeats no person or
+    movie, by exhaustive depth-first search.
+    """
+    paths = []
+
+    def extend(person_id, path, seen_people, seen_movies):
+        if person_id == target:
+            paths.append(path)
+            return
+        for movie_id, star_id in degrees.neighbors_for_person(person_id):
+            if movie_id in seen_movies or star_id in seen_people:
+                continue
+            extend(star_id, path + [(movie_id, star_id)],
+                   seen_people | {star_id}, seen_movies | {movie_id})
+
+    extend(source, [], {source}, set())
+    return paths
+
+
+def test_enumeration():
+    for storage in ("dict", "compact"):
+        degrees.load_data(SMALL, storage=storage)
+        for target in (TOM_CRUISE, TOM_HANKS):
+            expected = {tuple(path) for path in simple_paths(KEVIN_BACON, target)}
+            shortest = min(len(path) for path in expected)
+
+            paths = [tuple(path) for path in degrees.k_shortest_paths(KEVIN_BACON, target)]
+            assert len(paths) == len(set(paths))
+            assert set(paths) == expected
+            assert [len(path) for path in paths] == sorted(len(path) for path in paths)
+
+            paths = [tuple(path) for path in degrees.all_shortest_paths(KEVIN_BACON, target)]
+            assert len(paths) == len(set(paths))
+            assert set(paths) == {path for path in expected if len(path) == shortest}
+
+
+def split_dataset(directory):
+    """
+    Split the small dataset into a base and a delta in `directory`: the
+    base holds the first two thirds of the people and movies and the
+    stars among them, and the delta the rest plus one dangling star.
+    """
+    tables = {}
+    for name in ("people.csv", "movies.csv", "stars.csv"):
+        with open(os.path.join(SMALL, name), encoding="utf-8") as f:
+            reader = csv.reader(f)
+            tables[name] = (next(reader), list(reader))
+    people, movies = tables["people.csv"][1], tables["movies.csv"][1]
+    base_people = {row[0] for row in people[:len(people) * 2 // 3]}
+    base_movies = {row[0] for row in movies[:len(movies) * 2 // 3]}
+    in_base = {
+        "people.csv": lambda row: row[0] in base_people,
+        "movies.csv": lambda row: row[0] in base_movies,
+        "stars.csv": lambda row: row[0] in base_people and row[1] in base_movies,
+    }
+
+    for part in ("base", "delta"):
+        os.mkdir(os.path.join(directory, part))
+        for name, (header, rows) in tables.items():
+            rows = [row for row in rows if in_base[name](row) == (part == "base")]
+            if part == "delta" and name == "stars.csv":
+                rows.append(["0", rows[0][1]])
+            with open(os.path.join(directory, part, name), "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(rows)
+    return os.path.join(directory, "base"), os.path.join(directory, "delta")
+
+
+def dataset_state():
+    """
+    Returns the loaded people, movies and component partition as plain
+    values, for comparing one load with another.
+    """
+    people = {person_id: dict(person) for person_id, person in degrees.people.items()}
+    movies = {movie_id: dict(movie) for movie_id, movie in degrees.movies.items()}
+    partition = {}
+    for person_id in people:
+        partition.setdefault(degrees.component_of(person_id), set()).add(person_id)
+    return people, movies, sorted(map(sorted, partition.values()))
+
+
+def test_delta():
+    for storage in ("dict", "compact"):
+        with tempfile.TemporaryDirectory() as directory:
+            base, delta = split_dataset(directory)
+            degrees.load_data(base, storage=storage)
+            degrees.find_names("tom hanx")
+            counts = degrees.apply_delta(delta)
+            assert counts["stars"] > 0 and counts["dangling"] == 1
+            assert degrees.apply_delta(delta)["stars"] == 0
+            state = dataset_state()
+            found = degrees.find_names("tom hanx")
+            completed = degrees.complete_name("t", 20)
+
+        degrees.load_data(SMALL, storage=storage)
+        assert state == dataset_state()
+        assert found == degrees.find_names("tom hanx")
+        assert completed == degrees.complete_name("t", 20)
+
+
+def test_deadline():
+    start = time.time()
+    try:
+        with _deadline(start + 0.05):
+            while True:
+                pass
+    except SearchTimeout:
+        pass
+    assert time.time() - start < 1
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name}: ok")
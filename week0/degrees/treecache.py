@@ -0,0 +1,154 @@
+"""
+LRU cache of completed breadth-first search trees over a CompactGraph.
+
+Each tree is stored as two parent arrays indexed by dense person id, so
+once a source's tree is cached, a path to any target is just a walk up
+the tree. Since the co-star graph is undirected, a tree rooted at the
+target answers the query too.
+"""
+
+from array import array
+from collections import OrderedDict
+
+# Parent entry for people the tree does not reach
+UNREACHED = -1
+
+
+class BFSTree():
+    """
+    Shortest-path tree from `root`: person p was reached from
+    parent_person[p] through movie parent_movie[p].
+    """
+
+    def __init__(self, root, parent_person, parent_movie):
+        self.root = root
+        self.parent_person = parent_person
+        self.parent_movie = parent_movie
+
+    @classmethod
+    def build(cls, graph, root):
+        """
+        Run a full bipartite breadth-first search from `root`.
+        """
+        parent_person = array("i", [UNREACHED]) * graph.num_people
+        parent_movie = array("i", [UNREACHED]) * graph.num_people
+        visited_movies = bytearray(graph.num_movies)
+        parent_person[root] = root
+
+        layer = [root]
+        while layer:
+            next_layer = []
+            for p in layer:
+                for m in graph.movies_of(p):
+                    if visited_movies[m]:
+                        continue
+                    visited_movies[m] = 1
+                    for q in graph.stars_of(m):
+                        if parent_person[q] == UNREACHED:
+                            parent_person[q] = p
+                            parent_movie[q] = m
+                            next_layer.append(q)
+            layer = next_layer
+        return cls(root, parent_person, parent_movie)
+
+    def reaches(self, p):
+        return self.parent_person[p] != UNREACHED
+
+    def path_from_root(self, target):
+        """
+        Returns the (movie, person) path from the root to `target`, or None.
+        """
+        if not self.reaches(target):
+            return None
+        path = []
+        p = target
+        while p != self.root:
+            path.append((self.parent_movie[p], p))
+            p = self.parent_person[p]
+        path.reverse()
+        return path
+
+    def path_to_root(self, source):
+        """
+        Returns the (movie, person) path from `source` to the root, or None.
+        """
+        if not self.reaches(source):
+            return None
+        path = []
+        p = source
+        while p != self.root:
+            path.append((self.parent_movie[p], self.parent_person[p]))
+            p = self.parent_person[p]
+        return path
+
+    @property
+    def nbytes(self):
+        return (
+            self.parent_person.itemsize * len(self.parent_person)
+            + self.parent_movie.itemsize * len(self.parent_movie)
+        )
+
+
+class TreeCache():
+    """
+    Size-bounded LRU cache of BFSTrees keyed by root person.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.trees = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, root):
+        tree = self.trees.get(root)
+        if tree is not None:
+            self.trees.move_to_end(root)
+        return tree
+
+    def add(self, tree):
+        if tree.root in self.trees:
+            return
+        self.trees[tree.root] = tree
+        self.nbytes += tree.nbytes
+        while self.nbytes > self.max_bytes and len(self.trees) > 1:
+            _, evicted = self.trees.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            self.evictions += 1
+
+    def path(self, graph, source, target):
+        """
+        Returns (path, hit) for dense people `source` and `target`,
+        walking a cached tree rooted at either end, or building and
+        caching the source's tree on a miss.
+        """
+        tree = self.get(source)
+        if tree is not None:
+            self.hits += 1
+            return tree.path_from_root(target), True
+
+        tree = self.get(target)
+        if tree is not None:
+            self.hits += 1
+            return tree.path_to_root(source), True
+
+        self.misses += 1
+        tree = BFSTree.build(graph, source)
+        self.add(tree)
+        return tree.path_from_root(target), False
+
+    def clear(self):
+        self.trees.clear()
+        self.nbytes = 0
+
+    def info(self):
+        return {
+            "trees": len(self.trees),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -1,4 +1,11 @@
+import heapq
+from collections import deque
+from itertools import count
+
+
 class Node():
+    __slots__ = ("state", "parent", "action")
+
     def __init__(self, state, parent, action):
         self.state = state
         self.parent = parent
@@ -37,3 +44,67 @@ class QueueFrontier(StackFrontier):
             self.frontier = self.frontier[1:]
             return node
 
+
+class DequeStackFrontier():
+    """
+    Stack frontier with O(1) add, remove and contains_state,
+    backed by a deque plus a count of each state it holds.
+    """
+
+    def __init__(self):
+        self.frontier = deque()
+        self.states = {}
+
+    def add(self, node):
+        self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def contains_state(self, state):
+        return state in self.states
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def __len__(self):
+        return len(self.frontier)
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.pop()
+            remaining = self.states[node.state] - 1
+            if remaining:
+                self.states[node.state] = remaining
+            else:
+                del self.states[node.state]
+            return node
+
+    def pop(self):
+        return self.frontier.pop()
+
+
+class DequeQueueFrontier(DequeStackFrontier):
+
+    def pop(self):
+        return self.frontier.popleft()
+
+
+class PriorityFrontier(DequeStackFrontier):
+    """
+    Frontier that removes the node with the lowest `priority(node)` first,
+    breaking ties in insertion order.
+    """
+
+    def __init__(self, priority):
+        super().__init__()
+        self.frontier = []
+        self.priority = priority
+        self.counter = count()
+
+    def add(self, node):
+        heapq.heappush(self.frontier, (self.priority(node), next(self.counter), node))
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def pop(self):
+        return heapq.heappop(self.frontier)[2]